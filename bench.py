@@ -0,0 +1,169 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Benchmarks for the hot paths of qonstruct. Each benchmark is timed
+    (best and median of several runs, excluding setup) and memory-profiled
+    (peak traced allocation) over a sweep of distances. Results are JSON, so
+    runs on different commits can be compared:
+
+        python -m qonstruct.bench --output new.json --distances 3,5,7,9
+        python -m qonstruct.bench --compare old.json --against new.json
+
+    Other options: --names (comma-separated subset of BENCHMARKS), --repeat,
+    --threshold (for --compare) and -no-memory. The scheduler is
+    benchmarked with the greedy backend, so no solver is needed.
+"""
+
+from qonstruct.code_builder.base import *
+from qonstruct.code_builder.surface_code import make_rotated
+from qonstruct.code_builder.color_code import make_hexagonal, color_tanner_graph
+from qonstruct.scheduling import compute_syndrome_extraction_schedule
+from qonstruct.distance import compute_distance
+from qonstruct.qes.manager import QesManager
+from qonstruct.utils import binrref, null
+from qonstruct.parsing.cmd import *
+
+import networkx as nx
+import numpy as np
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+def _uncolored_hexagonal(d: int) -> nx.Graph:
+    # The hexagonal color code without colors or plaquettes. Everything
+    # else (e.g. the observables) is kept.
+    gr = make_hexagonal(d)
+    for k in ['plaquettes', 'plaquette_support_map', 'plaquette_color_map', 'plaquette_check_map']:
+        gr.graph.pop(k, None)
+    for ch in gr.graph['checks']['all']:
+        gr.nodes[ch].pop('color', None)
+        gr.nodes[ch].pop('plaquette', None)
+    return gr
+
+def _discard():
+    while True:
+        yield
+
+def _emit(gr: nx.Graph, rounds: int) -> None:
+    mgr = QesManager(gr)
+    mgr.attach(_discard())
+    mgr.write_memory_experiment(rounds)
+    mgr.fclose()
+
+# name -> (setup(d), run(state)). The setup is not timed, and runs before
+# every repetition since some benchmarks modify the graph.
+BENCHMARKS = {
+    'make_rotated': (lambda d: d, make_rotated),
+    'make_hexagonal': (lambda d: d, make_hexagonal),
+    'make_check_graph': (make_hexagonal, lambda gr: make_check_graph(gr, 'all')),
+    'color_tanner_graph': (_uncolored_hexagonal, color_tanner_graph),
+    'binrref': (lambda d: get_parity_check_matrix(make_hexagonal(d), 'x', 'dense'), binrref),
+    'null': (lambda d: get_parity_check_matrix(make_hexagonal(d), 'x', 'dense'), null),
+    'schedule': (_uncolored_hexagonal, lambda gr: compute_syndrome_extraction_schedule(gr, backend='greedy')),
+    'write_memory_experiment': (lambda d: (make_hexagonal(d), d), lambda state: _emit(*state)),
+    'compute_distance': (make_rotated, lambda gr: compute_distance(gr, True))
+}
+
+def run_benchmarks(distances: list[int] = [3, 5, 7, 9],
+                    names: list[str] = None,
+                    repeat: int = 3,
+                    memory=True,
+                    verbose=False) -> dict:
+    """
+        Runs the benchmarks in names (default: all of BENCHMARKS) at each
+        distance. Returns a dict with the environment ('meta') and one result
+        per (benchmark, distance) ('results'), holding the best and median
+        time in seconds and, if memory is True, the peak traced allocation
+        in bytes (from an extra run under tracemalloc).
+    """
+    if names is None:
+        names = list(BENCHMARKS)
+    results = []
+    for name in names:
+        setup, run = BENCHMARKS[name]
+        for d in distances:
+            times = []
+            for _ in range(repeat):
+                state = setup(d)
+                t = time.perf_counter()
+                run(state)
+                times.append(time.perf_counter() - t)
+            entry = {'name': name, 'd': d, 'time_min': min(times), 'time_median': statistics.median(times)}
+            if memory:
+                state = setup(d)
+                tracemalloc.start()
+                run(state)
+                entry['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            if verbose:
+                print('%-24s d=%-3d %.6fs' % (name, d, entry['time_min']), file=sys.stderr)
+            results.append(entry)
+    return {'meta': _environment(), 'results': results}
+
+def compare_benchmarks(old: dict, new: dict, threshold: float = 0.1) -> list[dict]:
+    """
+        Matches the results of two runs by (benchmark, distance). For each
+        match, returns the ratio new/old of the best time (and of the peak
+        memory, if both runs measured it), and whether either ratio exceeds
+        1 + threshold.
+    """
+    old_map = {(r['name'], r['d']): r for r in old['results']}
+    out = []
+    for r in new['results']:
+        o = old_map.get((r['name'], r['d']))
+        if o is None:
+            continue
+        entry = {'name': r['name'], 'd': r['d'], 'time_ratio': r['time_min'] / max(o['time_min'], 1e-12)}
+        if 'peak_bytes' in r and 'peak_bytes' in o:
+            entry['memory_ratio'] = r['peak_bytes'] / max(o['peak_bytes'], 1)
+        entry['regression'] = any(entry.get(k, 0) > 1 + threshold for k in ['time_ratio', 'memory_ratio'])
+        out.append(entry)
+    return out
+
+def _environment() -> dict:
+    meta = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'networkx': nx.__version__,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    try:
+        meta['commit'] = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                        capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return meta
+
+def _load(path: str) -> dict:
+    with open(path, 'r') as reader:
+        return json.load(reader)
+
+if __name__ == '__main__':
+    arg_list = parse(sys.argv[1:])
+    if 'compare' in arg_list:
+        threshold = try_get_float(arg_list, 'threshold') if 'threshold' in arg_list else 0.1
+        rows = compare_benchmarks(_load(try_get_string(arg_list, 'compare')),
+                                    _load(try_get_string(arg_list, 'against')), threshold)
+        for r in rows:
+            print('%-24s d=%-3d time x%.2f%s%s' % (r['name'], r['d'], r['time_ratio'],
+                    '  memory x%.2f' % r['memory_ratio'] if 'memory_ratio' in r else '',
+                    '  REGRESSION' if r['regression'] else ''))
+        exit(1 if any(r['regression'] for r in rows) else 0)
+
+    distances = [int(x) for x in arg_list.get('distances', '3,5,7,9').split(',')]
+    names = arg_list['names'].split(',') if 'names' in arg_list else None
+    repeat = try_get_int(arg_list, 'repeat') if 'repeat' in arg_list else 3
+    results = run_benchmarks(distances, names, repeat, memory='no-memory' not in arg_list, verbose=True)
+    if 'output' in arg_list:
+        with open(try_get_string(arg_list, 'output'), 'w') as writer:
+            json.dump(results, writer, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
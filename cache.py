@@ -0,0 +1,74 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    A size-bounded on-disk cache. Each entry is a file named by its key in
+    the cache directory. Reads refresh the file's modification time, and
+    when the directory grows past max_bytes the least recently used entries
+    are evicted.
+"""
+
+import os
+
+DEFAULT_MAX_BYTES = 1 << 30
+
+def cache_load(cache_dir: str, key: str) -> bytes|None:
+    """
+        Returns the data stored under key, or None on a miss.
+    """
+    path = _entry_path(cache_dir, key)
+    try:
+        with open(path, 'rb') as reader:
+            data = reader.read()
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        # The cache may be read-only or shared; the entry is still good.
+        pass
+    return data
+
+def cache_store(cache_dir: str, key: str, data: bytes, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+    """
+        Stores data under key and evicts old entries if the cache is larger
+        than max_bytes. The write is atomic, so concurrent jobs can share a
+        cache directory.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(cache_dir, key)
+    tmp = '%s.tmp%d' % (path, os.getpid())
+    with open(tmp, 'wb') as writer:
+        writer.write(data)
+    os.replace(tmp, path)
+    _evict(cache_dir, max_bytes)
+
+def cache_remove(cache_dir: str, key: str) -> None:
+    try:
+        os.remove(_entry_path(cache_dir, key))
+    except FileNotFoundError:
+        pass
+
+def _entry_path(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, key)
+
+def _evict(cache_dir: str, max_bytes: int) -> None:
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if not entry.is_file() or '.tmp' in entry.name:
+            continue
+        try:
+            st = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for (_, size, _) in entries)
+    entries.sort()
+    for (_, size, path) in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
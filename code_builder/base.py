@@ -6,9 +6,12 @@
 """
 
 import networkx as nx
+import numpy as np
 
 from collections import defaultdict
 
+import hashlib
+
 def tanner_init() -> nx.Graph:
     gr = nx.Graph()
     # Initialize structures for the graph.
@@ -20,12 +23,21 @@ def tanner_init() -> nx.Graph:
     gr.graph['plaquette_support_map'] = {}
     gr.graph['plaquette_color_map'] = {}
     gr.graph['plaquette_check_map'] = defaultdict(list)
+    # Sparse (CSR) parity-check matrices H_X and H_Z. Row i is the i-th check
+    # in gr.graph['checks'][type], column j is gr.graph['data_qubits'][j].
+    # These are kept as lists by add_data_qubit/add_check, and converted to
+    # arrays on demand (see get_parity_check_csr).
+    gr.graph['data_qubit_index'] = {}
+    gr.graph['pcm'] = {s: {'indptr': [0], 'indices': []} for s in ['x', 'z']}
+    gr.graph['pcm_cache'] = {}
     return gr
 
 def add_data_qubit(gr: nx.Graph, q: int, **kwargs) -> None:
     gr.add_node(q, node_type='data')
     for (k, v) in kwargs.items():
         gr.nodes[q][k] = v
+    if 'data_qubit_index' in gr.graph:
+        gr.graph['data_qubit_index'][q] = len(gr.graph['data_qubits'])
     gr.graph['data_qubits'].append(q)
 
 def add_check(gr: nx.Graph, check: int, check_type: str, support: list[int], **kwargs) -> None:
@@ -41,6 +53,49 @@ def add_check(gr: nx.Graph, check: int, check_type: str, support: list[int], **k
         if not gr.has_node(q):
             add_data_qubit(gr, q)
         gr.add_edge(check, q)
+    if 'pcm' in gr.graph:
+        index = gr.graph['data_qubit_index']
+        pcm = gr.graph['pcm'][check_type]
+        pcm['indices'].extend(index[q] for q in dict.fromkeys(support) if q is not None)
+        pcm['indptr'].append(len(pcm['indices']))
+
+def add_data_qubits_from(gr: nx.Graph, qubits: list[int]) -> None:
+    """
+        Bulk version of add_data_qubit.
+    """
+    qubits = list(qubits)
+    gr.add_nodes_from(qubits, node_type='data')
+    if 'data_qubit_index' in gr.graph:
+        k = len(gr.graph['data_qubits'])
+        gr.graph['data_qubit_index'].update((q, k+i) for (i, q) in enumerate(qubits))
+    gr.graph['data_qubits'].extend(qubits)
+
+def add_checks_from(gr: nx.Graph,
+                    checks: list[int],
+                    check_types: list[str],
+                    supports: list[list[int]],
+                    **kwargs) -> None:
+    """
+        Bulk version of add_check: each keyword argument is a list with one
+        value per check. The result is the same as calling add_check for
+        each check in order, except that data qubits that are not yet in the
+        graph are added after all the checks.
+    """
+    attrs = list(kwargs.items())
+    gr.add_nodes_from((ch, {'node_type': s, 'schedule_order': [], **{k: v[i] for (k, v) in attrs}})
+                        for (i, (ch, s)) in enumerate(zip(checks, check_types)))
+    missing = [q for q in dict.fromkeys(q for supp in supports for q in supp) if q is not None and not gr.has_node(q)]
+    add_data_qubits_from(gr, missing)
+    gr.add_edges_from((ch, q) for (ch, supp) in zip(checks, supports) for q in supp if q is not None)
+    for (ch, s) in zip(checks, check_types):
+        gr.graph['checks']['all'].append(ch)
+        gr.graph['checks'][s].append(ch)
+    if 'pcm' in gr.graph:
+        index = gr.graph['data_qubit_index']
+        for (s, supp) in zip(check_types, supports):
+            pcm = gr.graph['pcm'][s]
+            pcm['indices'].extend(index[q] for q in dict.fromkeys(supp) if q is not None)
+            pcm['indptr'].append(len(pcm['indices']))
 
 def get_support(gr: nx.Graph, check: int) -> list[int]:
     return [x for x in gr.neighbors(check)]
@@ -48,18 +103,133 @@ def get_support(gr: nx.Graph, check: int) -> list[int]:
 def add_observable(gr: nx.Graph, observable: list[int], obs_type: str) -> None:
     gr.graph['obs_list'][obs_type].append(observable)
 
+def get_parity_check_csr(gr: nx.Graph, check_type: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Returns (indptr, indices) of the CSR parity-check matrix for the given
+        check type. Row i is gr.graph['checks'][check_type][i]; the column
+        indices of row i are indices[indptr[i]:indptr[i+1]], in the order the
+        support was given to add_check.
+    """
+    if 'pcm' not in gr.graph:
+        _rebuild_pcm(gr)
+    pcm = gr.graph['pcm'][check_type]
+    key = (check_type, 'csr')
+    cached = gr.graph['pcm_cache'].get(key)
+    if cached is None or len(cached[0]) != len(pcm['indptr']):
+        cached = (np.array(pcm['indptr'], dtype=np.int64), np.array(pcm['indices'], dtype=np.int64))
+        gr.graph['pcm_cache'][key] = cached
+    return cached
+
+def get_parity_check_csc(gr: nx.Graph, check_type: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Returns (indptr, indices) of the CSC parity-check matrix for the given
+        check type: the checks of that type on data qubit column j are the rows
+        indices[indptr[j]:indptr[j+1]], in increasing order.
+    """
+    indptr, indices = get_parity_check_csr(gr, check_type)
+    n_data = len(gr.graph['data_qubits'])
+    key = (check_type, 'csc')
+    cached = gr.graph['pcm_cache'].get(key)
+    if cached is None or cached[0] is not indptr or len(cached[1][0]) != n_data+1:
+        rows = np.repeat(np.arange(len(indptr)-1, dtype=np.int64), np.diff(indptr))
+        order = np.argsort(indices, kind='stable')
+        col_indptr = np.zeros(n_data+1, dtype=np.int64)
+        np.cumsum(np.bincount(indices, minlength=n_data), out=col_indptr[1:])
+        cached = (indptr, (col_indptr, rows[order]))
+        gr.graph['pcm_cache'][key] = cached
+    return cached[1]
+
+def get_parity_check_matrix(gr: nx.Graph, check_type: str, fmt='csr'):
+    """
+        Returns the parity-check matrix for the given check type as a
+        scipy.sparse matrix (fmt is 'csr' or 'csc'), or as a dense bool
+        array if fmt is 'dense'.
+    """
+    indptr, indices = get_parity_check_csr(gr, check_type)
+    shape = (len(indptr)-1, len(gr.graph['data_qubits']))
+    if fmt == 'dense':
+        m = np.zeros(shape, dtype=bool)
+        m[np.repeat(np.arange(shape[0]), np.diff(indptr)), indices] = True
+        return m
+    import scipy.sparse
+    m = scipy.sparse.csr_array((np.ones(len(indices), dtype=np.uint8), indices, indptr), shape=shape)
+    return m.tocsc() if fmt == 'csc' else m
+
+def _rebuild_pcm(gr: nx.Graph) -> None:
+    # For graphs that were not created by tanner_init (i.e. older pickles).
+    gr.graph['data_qubit_index'] = {q: i for (i, q) in enumerate(gr.graph['data_qubits'])}
+    gr.graph['pcm'] = {s: {'indptr': [0], 'indices': []} for s in ['x', 'z']}
+    gr.graph['pcm_cache'] = {}
+    index = gr.graph['data_qubit_index']
+    for s in ['x', 'z']:
+        pcm = gr.graph['pcm'][s]
+        for ch in gr.graph['checks'][s]:
+            pcm['indices'].extend(index[q] for q in gr.neighbors(ch))
+            pcm['indptr'].append(len(pcm['indices']))
+
+def get_check_overlaps(gr: nx.Graph, check_type: str) -> list[list[int]]:
+    """
+        For each check in gr.graph['checks'][check_type] ('x', 'z' or 'all'),
+        returns the positions (in that list) of the other checks that share a
+        data qubit with it, in increasing order. Each data qubit is visited
+        once and only the checks incident to it are joined.
+    """
+    checks = gr.graph['checks'][check_type]
+    types = ['x', 'z'] if check_type == 'all' else [check_type]
+    pos = {ch: i for (i, ch) in enumerate(checks)}
+    columns = []
+    for s in types:
+        row_map = np.array([pos[ch] for ch in gr.graph['checks'][s]], dtype=np.int64)
+        indptr, indices = get_parity_check_csc(gr, s)
+        columns.append((indptr.tolist(), row_map[indices].tolist()))
+    overlaps = [set() for _ in checks]
+    for j in range(len(gr.graph['data_qubits'])):
+        incident = []
+        for (indptr, indices) in columns:
+            incident.extend(indices[indptr[j]:indptr[j+1]])
+        if len(incident) < 2:
+            continue
+        for i in incident:
+            overlaps[i].update(incident)
+    for (i, s) in enumerate(overlaps):
+        s.discard(i)
+    return [sorted(s) for s in overlaps]
+
+def get_check_overlap_matrix(gr: nx.Graph, check_type: str):
+    """
+        Returns H*H^T as a scipy.sparse CSR matrix, where the rows of H are the
+        checks in gr.graph['checks'][check_type]. Entry (i,j) is the number of
+        data qubits shared by checks i and j.
+    """
+    import scipy.sparse
+    if check_type == 'all':
+        H = scipy.sparse.vstack([get_parity_check_matrix(gr, s) for s in ['x', 'z']], format='csr')
+        pos = {ch: i for (i, ch) in enumerate(gr.graph['checks']['x'] + gr.graph['checks']['z'])}
+        H = H[[pos[ch] for ch in gr.graph['checks']['all']]]
+    else:
+        H = get_parity_check_matrix(gr, check_type)
+    H = H.astype(np.int64)
+    return (H @ H.T).tocsr()
+
 def make_check_graph(gr: nx.Graph, check_type: str) -> nx.Graph:
+    checks = gr.graph['checks'][check_type]
     cgr = nx.Graph()
-    for x in gr.graph['checks'][check_type]:
-        for y in gr.graph['checks'][check_type]:
-            if x == y:
-                continue
-            if cgr.has_edge(x, y):
-                continue
-            if len(list(nx.common_neighbors(gr, x, y))) > 0:
-                cgr.add_edge(x, y)
+    for (i, nbrs) in enumerate(get_check_overlaps(gr, check_type)):
+        cgr.add_edges_from((checks[i], checks[j]) for j in nbrs)
     return cgr
 
+def tanner_graph_fingerprint(gr: nx.Graph) -> str:
+    """
+        Returns a hash of the checks of the graph: the id, type and (sorted)
+        support of each check, in the order of gr.graph['checks']['all'].
+        Two graphs with the same fingerprint accept the same schedules.
+    """
+    h = hashlib.sha256()
+    for ch in gr.graph['checks']['all']:
+        support = sorted(gr.neighbors(ch))
+        h.update(('%d%s:%s;' % (ch, gr.nodes[ch]['node_type'], ','.join(str(q) for q in support))).encode())
+    return h.hexdigest()
+
 # Specific Code Functions:
 
 def add_plaquette(gr: nx.Graph, plaquette: int, support: list[int], color: int) -> None:
@@ -68,11 +238,18 @@ def add_plaquette(gr: nx.Graph, plaquette: int, support: list[int], color: int)
     gr.graph['plaquette_color_map'][plaquette] = color
 
 def set_plaquette(gr: nx.Graph, check: int, plaquette: int) -> None:
-    if plaquette not in gr.graph['plaquettes']:
-        add_plaquette(gr, plaquette)
+    if plaquette not in gr.graph['plaquette_support_map']:
+        add_plaquette(gr, plaquette, get_support(gr, check), gr.nodes[check].get('color'))
     gr.nodes[check]['plaquette'] = plaquette
     gr.graph['plaquette_check_map'][plaquette].append(check)
 
 def get_plaquette(gr: nx.Graph, check: int) -> int:
     return gr.nodes[check]['plaquette']
 
+def add_flags_to(gr: nx.Graph, q1: int, q2: int, check: int) -> None:
+    """
+        Records that q1 and q2 share a flag qubit during the measurement of
+        check. QesManager creates these flags when it is given the graph.
+    """
+    gr.nodes[check].setdefault('flags', []).append([q1, q2])
+
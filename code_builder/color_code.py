@@ -6,88 +6,190 @@
 """
 
 from qonstruct.code_builder.base import *
-from qonstruct.utils import make_support_graph
 
 import networkx as nx
+import numpy as np
+
+from collections import defaultdict, deque
 
 def color_tanner_graph(gr: nx.Graph):
-    xsgr = make_support_graph(gr, 'x')
-    xcm = nx.coloring.greedy_color(xsgr, strategy='DSATUR')
-    max_color = max(x for (_, x) in xcm.items())
-    #print(f'computed {max_color+1}-coloring')
-    # Identify plaquettes and colors.
-    for (plaq, (xch, c)) in enumerate(xcm.items()):
-        # Find Z checks with same support as xch.
-        xsupp = [x for x in gr.neighbors(xch)]
-        for zch in gr.neighbors(xsupp[0]):
-            if gr.nodes[zch]['node_type'] != 'z':
+    """
+        Identifies the plaquettes of a color code Tanner graph (an X and a Z
+        check with the same support) and colors them. X and Z checks are
+        paired through a hash map of their sorted supports. Plaquettes are
+        colored by propagating a 3-coloring through the triples of plaquettes
+        that meet at a data qubit; if that fails (i.e. this is not a 2D color
+        code), DSATUR is used on the plaquette adjacency graph instead.
+
+        Any existing plaquettes and colors are replaced, so recoloring a
+        colored graph (e.g. one read from a file) leaves a single copy.
+    """
+    gr.graph['plaquettes'] = []
+    gr.graph['plaquette_support_map'] = {}
+    gr.graph['plaquette_color_map'] = {}
+    gr.graph['plaquette_check_map'] = defaultdict(list)
+    for ch in gr.graph['checks']['all']:
+        gr.nodes[ch].pop('plaquette', None)
+        gr.nodes[ch].pop('color', None)
+    x_checks = gr.graph['checks']['x']
+    overlaps = get_check_overlaps(gr, 'x')
+    colors = _three_color_checks(gr, overlaps)
+    if colors is None:
+        xsgr = nx.Graph()
+        xsgr.add_nodes_from(range(len(x_checks)))
+        for (i, nbrs) in enumerate(overlaps):
+            xsgr.add_edges_from((i, j) for j in nbrs)
+        xcm = nx.coloring.greedy_color(xsgr, strategy='DSATUR')
+        colors = [xcm[i] for i in range(len(x_checks))]
+    # Pair X and Z checks with the same support.
+    z_map = defaultdict(list)
+    for zch in gr.graph['checks']['z']:
+        z_map[tuple(sorted(gr.neighbors(zch)))].append(zch)
+    for (plaq, (xch, c)) in enumerate(zip(x_checks, colors)):
+        xsupp = get_support(gr, xch)
+        matches = z_map.get(tuple(sorted(xsupp)))
+        if not matches:
+            continue
+        zch = matches.pop()
+        add_plaquette(gr, plaq, xsupp, c)
+        for ch in [xch, zch]:
+            gr.nodes[ch]['color'] = c
+            set_plaquette(gr, ch, plaq)
+
+def _three_color_checks(gr: nx.Graph, overlaps: list[list[int]]) -> list[int]|None:
+    """
+        Returns a 3-coloring of the X checks (by position), or None if one
+        could not be found. In a color code, the (up to) three plaquettes on
+        a data qubit have distinct colors, so once two are colored the third
+        is forced. Checks are seeded in BFS order and forced colors are
+        propagated after every choice.
+    """
+    indptr, indices = get_parity_check_csr(gr, 'x')
+    indptr, indices = indptr.tolist(), indices.tolist()
+    check_qubits = [indices[indptr[i]:indptr[i+1]] for i in range(len(indptr)-1)]
+    indptr, indices = get_parity_check_csc(gr, 'x')
+    indptr, indices = indptr.tolist(), indices.tolist()
+    qubit_checks = [indices[indptr[j]:indptr[j+1]] for j in range(len(indptr)-1)]
+
+    n = len(check_qubits)
+    color = [-1 for _ in range(n)]
+
+    def propagate(i: int, c: int) -> bool:
+        stack = [(i, c)]
+        while len(stack) > 0:
+            i, c = stack.pop()
+            if color[i] != -1:
+                if color[i] != c:
+                    return False
                 continue
-            zsupp = [x for x in gr.neighbors(zch)]
-            if xsupp == zsupp:
-                add_plaquette(gr, plaq, xsupp, c)
-                for ch in [xch, zch]:
-                    gr.nodes[ch]['color'] = c
-                    gr.nodes[ch]['plaquette'] = plaq
-                    set_plaquette(gr, ch, plaq)
-                break
-    
+            color[i] = c
+            for q in check_qubits[i]:
+                incident = qubit_checks[q]
+                if len(incident) > 3:
+                    return False
+                known = [color[j] for j in incident if color[j] != -1]
+                if len(known) != len(set(known)):
+                    return False
+                if len(incident) == 3 and len(known) == 2:
+                    j = next(j for j in incident if color[j] == -1)
+                    stack.append((j, 3 - sum(known)))
+        return True
+
+    visited = [False for _ in range(n)]
+    for start in range(n):
+        if visited[start]:
+            continue
+        visited[start] = True
+        bfs = deque([start])
+        while len(bfs) > 0:
+            i = bfs.popleft()
+            if color[i] == -1:
+                used = set(color[j] for j in overlaps[i])
+                free = [c for c in range(3) if c not in used]
+                if len(free) == 0 or not propagate(i, free[0]):
+                    return None
+            for j in overlaps[i]:
+                if not visited[j]:
+                    visited[j] = True
+                    bfs.append(j)
+    if any(color[i] == color[j] for i in range(n) for j in overlaps[i]):
+        return None
+    return color
+
 def make_hexagonal(d: int, both_at_once=True) -> nx.Graph:
     """
         This function will return a tanner graph for a hexagonal color
-        code (weight-6 RGB plaquettes).
+        code (weight-6 RGB plaquettes). The code is computed by
+        make_hexagonal_arrays and the graph is built from it in bulk.
     """
+    code = make_hexagonal_arrays(d, both_at_once)
     gr = tanner_init()
-
-    # Some geometric properties of the code:
-    offset, side_len = 2, (3*d - 1)//2
-    # In our initial pass, we will go through the structure, and identify
-    # each qubit.
-    loc_map, check_locs, obs = {}, [], []
-    n = 0
-    for r in range(side_len):
-        row_off = offset
-        for c in range(r+1):
-            if row_off == 0:
-                check_locs.append((r, c))
-            else:
-                loc_map[(r, c)] = n
-                add_data_qubit(gr, n)
-                if c == 0:
-                    # This is the left edge of the triangle, which is a
-                    # X and Z operator.
-                    obs.append(n)
-                n += 1
-            row_off = (row_off+1) % 3
-        offset = (offset+1) % 3
+    add_data_qubits_from(gr, range(code['n_data']))
+    obs = code['observable'].tolist()
     add_observable(gr, obs, 'x')
     add_observable(gr, obs, 'z')
-    # Now, create all the checks and complete the Tanner graph.
-    get_loc = lambda _r, _c: loc_map[(_r, _c)] if (_r, _c) in loc_map else None
 
-    plaq = 0
-    for (i, j) in check_locs:
-        a = get_loc(i-1, j-1)
-        b = get_loc(i-1, j)
-        c = get_loc(i, j+1)
-        d = get_loc(i+1, j+1)
-        e = get_loc(i+1, j)
-        f = get_loc(i, j-1)
-
-        add_plaquette(gr, plaq, [a, b, c, d, e, f], i%3)
-        for stabilizer in ['x', 'z']:
-            # Create check vertex.
-            if both_at_once:
-                if stabilizer == 'z':
-#                   schedule_order = [b, c, d, a, f, e, None]
-                    schedule_order = [b, c, d, e, f, a, None, None, None, None, None, None]
-                else:
-#                   schedule_order = [None, b, a, f, c, d, e]
-                    schedule_order = [None, None, None, None, None, None, b, c, d, e, f, a]
-            else:
-                schedule_order = [b, c, e, d, a, f]
-            add_check(gr, n, stabilizer, [a, b, c, d, e, f],
-                    color=i%3, plaquette=plaq, schedule_order=schedule_order)
-            set_plaquette(gr, n, plaq)
-            n += 1
-        plaq += 1
+    to_list = lambda arr: [[None if q < 0 else q for q in x] for x in arr.tolist()]
+    supports = to_list(code['supports'])
+    colors = code['colors'].tolist()
+    n_plaq = len(supports)
+    for (plaq, (support, color)) in enumerate(zip(supports, colors)):
+        add_plaquette(gr, plaq, support, color)
+    # Each plaquette has an X check and then a Z check.
+    checks = code['check_ids'].ravel().tolist()
+    schedules = to_list(code['schedule_orders'].reshape(2*n_plaq, -1))
+    plaquettes = [p for p in range(n_plaq) for _ in range(2)]
+    add_checks_from(gr, checks, ['x', 'z']*n_plaq, [supports[p] for p in plaquettes],
+                    color=[colors[p] for p in plaquettes],
+                    plaquette=plaquettes,
+                    schedule_order=schedules)
+    for (ch, p) in zip(checks, plaquettes):
+        gr.graph['plaquette_check_map'][p].append(ch)
     return gr
+
+def make_hexagonal_arrays(d: int, both_at_once=True) -> dict:
+    """
+        Computes the hexagonal color code of make_hexagonal as arrays:
+            'n_data':           the number of data qubits (ids 0, ..., n_data-1),
+            'observable':       the data qubits on the left edge of the
+                                triangle, which is a X and Z observable,
+            'supports':         (P, 6) array with the data qubits a, ..., f of
+                                each plaquette (-1 if missing),
+            'colors':           (P,) array with the color of each plaquette,
+            'check_ids':        (P, 2) array with the ids of the X and Z check
+                                of each plaquette,
+            'schedule_orders':  (P, 2, L) array with the schedule orders of
+                                the X and Z checks (-1 for an idle step).
+    """
+    # Some geometric properties of the code:
+    side_len = (3*d - 1)//2
+    # The triangle is a set of points (r, c) with c <= r, in row-major order.
+    # The offset of row r is (2+r)%3, and a point is a check location if
+    # (offset + c)%3 == 0. Otherwise, it is a data qubit.
+    r, c = np.tril_indices(side_len)
+    is_check = (2 + r + c) % 3 == 0
+    n_data = int(np.count_nonzero(~is_check))
+    # Locations are padded by one on each side, and -1 marks "no qubit".
+    loc = np.full((side_len+2, side_len+2), -1, dtype=np.int64)
+    loc[r[~is_check]+1, c[~is_check]+1] = np.arange(n_data)
+    observable = np.flatnonzero(c[~is_check] == 0)
+
+    i, j = r[is_check]+1, c[is_check]+1
+    a, b, c_, d_, e, f = loc[i-1, j-1], loc[i-1, j], loc[i, j+1], loc[i+1, j+1], loc[i+1, j], loc[i, j-1]
+    supports = np.stack([a, b, c_, d_, e, f], axis=1)
+    n_plaq = len(supports)
+    if both_at_once:
+        idle = np.full((n_plaq, 6), -1, dtype=np.int64)
+        order = np.stack([b, c_, d_, e, f, a], axis=1)
+        zso = np.concatenate([order, idle], axis=1)
+        xso = np.concatenate([idle, order], axis=1)
+    else:
+        xso = zso = np.stack([b, c_, e, d_, a, f], axis=1)
+    return {
+        'n_data': n_data,
+        'observable': observable,
+        'supports': supports,
+        'colors': (i-1) % 3,
+        'check_ids': n_data + 2*np.arange(n_plaq)[:, None] + np.arange(2)[None, :],
+        'schedule_orders': np.stack([xso, zso], axis=1)
+    }
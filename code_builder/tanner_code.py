@@ -0,0 +1,400 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    A compact, array-backed alternative to the networkx Tanner graphs built
+    by code_builder.base. All per-node state lives in typed arrays (node
+    types, CSR supports, flattened schedule orders, colors and plaquettes),
+    so a node costs a few machine words instead of a networkx attribute dict.
+    Conversion to and from nx.Graph is lossless.
+"""
+
+from qonstruct.code_builder.base import *
+
+import networkx as nx
+import numpy as np
+
+from array import array
+
+NODE_TYPES = ['data', 'x', 'z']
+NODE_TYPE_CODES = {'data': 0, 'x': 1, 'z': 2}
+
+# Arrays of a TannerCode and their array typecodes. The observable tables
+# are stored per type (obs_indptr['x'] is obs_indptr_x).
+ARRAY_FIELDS = {
+    'node_ids': 'q', 'node_types': 'b', 'node_pos': 'q',
+    'data_qubits': 'q',
+    'check_ids': 'q', 'check_types': 'b', 'support_indptr': 'q', 'support_indices': 'q',
+    'schedule_start': 'q', 'schedule_len': 'q', 'schedule_data': 'q',
+    'check_colors': 'q', 'check_plaquettes': 'q',
+    'obs_indptr_x': 'q', 'obs_indices_x': 'q', 'obs_indptr_z': 'q', 'obs_indices_z': 'q',
+    'plaquette_ids': 'q', 'plaquette_colors': 'q', 'plaquette_indptr': 'q', 'plaquette_indices': 'q',
+    'plaquette_check_pairs': 'q'
+}
+ARRAY_DTYPES = {'q': np.dtype('<i8'), 'b': np.dtype('i1')}
+
+# Keys of gr.graph that TannerCode stores in its own arrays (or recomputes).
+_GRAPH_KEYS = ['data_qubits', 'checks', 'obs_list',
+                'plaquettes', 'plaquette_support_map', 'plaquette_color_map', 'plaquette_check_map',
+                'data_qubit_index', 'pcm', 'pcm_cache']
+
+class TannerCode:
+    """
+        Tanner graph stored as typed arrays. Checks are numbered by position
+        (in order of addition), and their supports are stored in CSR form as
+        data qubit positions, so that the rows of the parity-check matrices
+        can be read off directly. Schedule orders are flattened into one
+        array (-1 for None), and colors and plaquettes are stored per check
+        (-1 if unset). Plaquette supports also use -1 for None. Any other
+        node attributes are kept in node_attrs.
+
+        The methods mirror the functions of code_builder.base (add_check,
+        get_support, add_observable, get_plaquette, ...), without the graph
+        argument.
+    """
+    __slots__ = ('node_ids', 'node_types', 'node_pos', '_node_index',
+                 'data_qubits',
+                 'check_ids', 'check_types', 'support_indptr', 'support_indices',
+                 'schedule_start', 'schedule_len', 'schedule_data',
+                 'check_colors', 'check_plaquettes',
+                 'obs_indptr', 'obs_indices',
+                 'plaquette_ids', 'plaquette_colors', 'plaquette_indptr', 'plaquette_indices',
+                 '_plaquette_index', 'plaquette_check_pairs',
+                 'node_attrs', 'graph_attrs')
+
+    def __init__(self):
+        # Nodes in order of addition: id, type code and position in
+        # data_qubits or check_ids.
+        self.node_ids = array('q')
+        self.node_types = array('b')
+        self.node_pos = array('q')
+        self._node_index = {}
+
+        self.data_qubits = array('q')
+
+        self.check_ids = array('q')
+        self.check_types = array('b')
+        self.support_indptr = array('q', [0])
+        self.support_indices = array('q')
+        # A schedule length of -1 means that the check has no schedule_order.
+        self.schedule_start = array('q')
+        self.schedule_len = array('q')
+        self.schedule_data = array('q')
+        self.check_colors = array('q')
+        self.check_plaquettes = array('q')
+
+        self.obs_indptr = {s: array('q', [0]) for s in ['x', 'z']}
+        self.obs_indices = {s: array('q') for s in ['x', 'z']}
+
+        self.plaquette_ids = array('q')
+        self.plaquette_colors = array('q')
+        self.plaquette_indptr = array('q', [0])
+        self.plaquette_indices = array('q')
+        self._plaquette_index = {}
+        # (plaquette, check) pairs, in the order set_plaquette was called.
+        self.plaquette_check_pairs = array('q')
+
+        self.node_attrs = {}
+        self.graph_attrs = {}
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def __contains__(self, node: int) -> bool:
+        return node in self._index()
+
+    def _index(self) -> dict[int, int]:
+        # Node id -> position in node_ids. Built on first use, so that codes
+        # loaded from arrays (see from_arrays) open without a pass over the
+        # nodes.
+        if self._node_index is None:
+            self._node_index = {q: i for (i, q) in enumerate(self.node_ids.tolist())}
+        return self._node_index
+
+    def _plaquette_map(self) -> dict[int, int]:
+        if self._plaquette_index is None:
+            self._plaquette_index = {p: i for (i, p) in enumerate(self.plaquette_ids.tolist())}
+        return self._plaquette_index
+
+    def _add_node(self, node: int, type_code: int, pos: int) -> None:
+        self._index()[node] = len(self.node_ids)
+        self.node_ids.append(node)
+        self.node_types.append(type_code)
+        self.node_pos.append(pos)
+
+    def _check_pos(self, check: int) -> int:
+        i = self._index()[check]
+        if self.node_types[i] == 0:
+            raise ValueError('node %d is not a check' % check)
+        return self.node_pos[i]
+
+    def node_type(self, node: int) -> str:
+        return NODE_TYPES[self.node_types[self._index()[node]]]
+
+    def add_data_qubit(self, q: int, **kwargs) -> None:
+        self._add_node(q, 0, len(self.data_qubits))
+        self.data_qubits.append(q)
+        if len(kwargs) > 0:
+            self.node_attrs[q] = kwargs
+
+    def add_check(self, check: int, check_type: str, support: list[int], **kwargs) -> None:
+        k = len(self.check_ids)
+        self._add_node(check, NODE_TYPE_CODES[check_type], k)
+        self.check_ids.append(check)
+        self.check_types.append(NODE_TYPE_CODES[check_type])
+        self.schedule_start.append(len(self.schedule_data))
+        self.schedule_len.append(0)
+        self.check_colors.append(-1)
+        self.check_plaquettes.append(-1)
+        support = [q for q in dict.fromkeys(support) if q is not None]
+        index = self._index()
+        for q in support:
+            if q not in index:
+                self.add_data_qubit(q)
+        self.support_indices.extend(self.node_pos[index[q]] for q in support)
+        self.support_indptr.append(len(self.support_indices))
+        self._set_check_attrs(check, k, kwargs)
+
+    def _set_check_attrs(self, check: int, k: int, attrs: dict) -> None:
+        extra = {}
+        for (key, value) in attrs.items():
+            if key == 'schedule_order':
+                self._set_schedule_order(k, value)
+            elif key == 'color' and isinstance(value, (int, np.integer)) and value >= 0:
+                self.check_colors[k] = value
+            elif key == 'plaquette' and isinstance(value, (int, np.integer)) and value >= 0:
+                self.check_plaquettes[k] = value
+            else:
+                extra[key] = value
+        if len(extra) > 0:
+            self.node_attrs.setdefault(check, {}).update(extra)
+
+    def checks(self, check_type: str = 'all') -> list[int]:
+        if check_type == 'all':
+            return self.check_ids.tolist()
+        code = NODE_TYPE_CODES[check_type]
+        return [ch for (ch, s) in zip(self.check_ids.tolist(), self.check_types.tolist()) if s == code]
+
+    def get_support(self, check: int) -> list[int]:
+        k = self._check_pos(check)
+        return [int(self.data_qubits[j]) for j in self.support_indices[self.support_indptr[k]:self.support_indptr[k+1]].tolist()]
+
+    def get_schedule_order(self, check: int) -> list[int|None]|None:
+        k = self._check_pos(check)
+        if self.schedule_len[k] < 0:
+            return None
+        start = self.schedule_start[k]
+        return [None if q < 0 else q for q in self.schedule_data[start:start+self.schedule_len[k]].tolist()]
+
+    def set_schedule_order(self, check: int, schedule_order: list[int|None]) -> None:
+        self._set_schedule_order(self._check_pos(check), schedule_order)
+
+    def _set_schedule_order(self, k: int, schedule_order: list[int|None]) -> None:
+        values = [-1 if q is None else q for q in schedule_order]
+        if len(values) <= self.schedule_len[k]:
+            # Overwrite in place.
+            start = self.schedule_start[k]
+            self.schedule_data[start:start+len(values)] = array('q', values)
+        else:
+            self.schedule_start[k] = len(self.schedule_data)
+            self.schedule_data.extend(values)
+        self.schedule_len[k] = len(values)
+
+    def get_color(self, check: int) -> int|None:
+        c = int(self.check_colors[self._check_pos(check)])
+        return None if c < 0 else c
+
+    def set_color(self, check: int, color: int) -> None:
+        self.check_colors[self._check_pos(check)] = color
+
+    def add_flags_to(self, q1: int, q2: int, check: int) -> None:
+        self._check_pos(check)
+        self.node_attrs.setdefault(check, {}).setdefault('flags', []).append([q1, q2])
+
+    def add_observable(self, observable: list[int], obs_type: str) -> None:
+        self.obs_indices[obs_type].extend(observable)
+        self.obs_indptr[obs_type].append(len(self.obs_indices[obs_type]))
+
+    def obs_list(self, obs_type: str) -> list[list[int]]:
+        indptr, indices = self.obs_indptr[obs_type], self.obs_indices[obs_type]
+        indptr = indptr.tolist()
+        return [indices[indptr[i]:indptr[i+1]].tolist() for i in range(len(indptr)-1)]
+
+    # Specific Code Functions:
+
+    def add_plaquette(self, plaquette: int, support: list[int], color: int|None) -> None:
+        self._plaquette_map()[plaquette] = len(self.plaquette_ids)
+        self.plaquette_ids.append(plaquette)
+        self.plaquette_colors.append(-1 if color is None else color)
+        self.plaquette_indices.extend(-1 if q is None else q for q in support)
+        self.plaquette_indptr.append(len(self.plaquette_indices))
+
+    def set_plaquette(self, check: int, plaquette: int) -> None:
+        k = self._check_pos(check)
+        if plaquette not in self._plaquette_map():
+            self.add_plaquette(plaquette, self.get_support(check), self.get_color(check))
+        self.check_plaquettes[k] = plaquette
+        self.plaquette_check_pairs.extend([plaquette, check])
+
+    def get_plaquette(self, check: int) -> int:
+        p = int(self.check_plaquettes[self._check_pos(check)])
+        if p < 0:
+            raise KeyError('plaquette')
+        return p
+
+    def get_plaquette_support(self, plaquette: int) -> list[int]:
+        i = self._plaquette_map()[plaquette]
+        return [None if q < 0 else q for q in self.plaquette_indices[self.plaquette_indptr[i]:self.plaquette_indptr[i+1]].tolist()]
+
+    def get_plaquette_color(self, plaquette: int) -> int|None:
+        c = int(self.plaquette_colors[self._plaquette_map()[plaquette]])
+        return None if c < 0 else c
+
+    def get_parity_check_csr(self, check_type: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+            Same as code_builder.base.get_parity_check_csr: row i is the i-th
+            check of the given type and columns are data qubit positions.
+        """
+        indptr = np.frombuffer(self.support_indptr, dtype=np.int64)
+        indices = np.frombuffer(self.support_indices, dtype=np.int64)
+        rows = np.flatnonzero(np.frombuffer(self.check_types, dtype=np.int8) == NODE_TYPE_CODES[check_type])
+        return gather_csr_rows(indptr, indices, rows)
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """
+            Returns the arrays of the code (see ARRAY_FIELDS) as NumPy arrays,
+            without copying. Observable tables are named obs_indptr_x, etc.
+        """
+        arrays = {}
+        for (name, typecode) in ARRAY_FIELDS.items():
+            if name.startswith('obs_'):
+                value = getattr(self, name[:-2])[name[-1]]
+            else:
+                value = getattr(self, name)
+            arrays[name] = np.frombuffer(value, dtype=ARRAY_DTYPES[typecode])
+        return arrays
+
+    @staticmethod
+    def from_arrays(arrays: dict[str, np.ndarray],
+                    node_attrs: dict = {},
+                    graph_attrs: dict = {},
+                    copy=True) -> 'TannerCode':
+        """
+            Inverse of to_arrays. If copy is False, the code keeps the given
+            arrays (e.g. memory maps) and is read-only: the accessors work,
+            but adding nodes, observables or plaquettes does not.
+        """
+        code = TannerCode()
+        for (name, typecode) in ARRAY_FIELDS.items():
+            value = np.asarray(arrays[name], dtype=ARRAY_DTYPES[typecode])
+            if copy:
+                value = array(typecode, value.tobytes())
+            if name.startswith('obs_'):
+                getattr(code, name[:-2])[name[-1]] = value
+            else:
+                setattr(code, name, value)
+        code._node_index = None
+        code._plaquette_index = None
+        code.node_attrs = dict(node_attrs)
+        code.graph_attrs = dict(graph_attrs)
+        return code
+
+    @staticmethod
+    def from_graph(gr: nx.Graph) -> 'TannerCode':
+        """
+            Converts a Tanner graph built with code_builder.base.
+        """
+        code = TannerCode()
+        data_pos = {q: i for (i, q) in enumerate(gr.graph['data_qubits'])}
+        check_pos = {ch: i for (i, ch) in enumerate(gr.graph['checks']['all'])}
+        code.data_qubits = array('q', gr.graph['data_qubits'])
+        code.check_ids = array('q', gr.graph['checks']['all'])
+        for (node, attrs) in gr.nodes(data=True):
+            s = attrs['node_type']
+            code._add_node(node, NODE_TYPE_CODES[s], data_pos[node] if s == 'data' else check_pos[node])
+            extra = {k: v for (k, v) in attrs.items() if k != 'node_type'}
+            if s == 'data' and len(extra) > 0:
+                code.node_attrs[node] = extra
+
+        n_checks = len(code.check_ids)
+        code.check_types = array('b', (NODE_TYPE_CODES[gr.nodes[ch]['node_type']] for ch in code.check_ids))
+        code.schedule_start = array('q', [0]) * n_checks
+        code.schedule_len = array('q', [-1]) * n_checks
+        code.check_colors = array('q', [-1]) * n_checks
+        code.check_plaquettes = array('q', [-1]) * n_checks
+        for (k, ch) in enumerate(code.check_ids):
+            code.support_indices.extend(data_pos[q] for q in gr.neighbors(ch))
+            code.support_indptr.append(len(code.support_indices))
+            attrs = {key: v for (key, v) in gr.nodes[ch].items() if key != 'node_type'}
+            code._set_check_attrs(ch, k, attrs)
+
+        for s in ['x', 'z']:
+            for obs in gr.graph['obs_list'][s]:
+                code.add_observable(obs, s)
+        for p in gr.graph['plaquettes']:
+            code.add_plaquette(p, gr.graph['plaquette_support_map'][p], gr.graph['plaquette_color_map'][p])
+        for (p, checks) in gr.graph['plaquette_check_map'].items():
+            for ch in checks:
+                code.plaquette_check_pairs.extend([p, ch])
+        code.graph_attrs = {k: v for (k, v) in gr.graph.items() if k not in _GRAPH_KEYS}
+        return code
+
+    def to_graph(self) -> nx.Graph:
+        """
+            Converts back to a networkx Tanner graph. Node order, adjacency
+            order and all attributes are preserved.
+        """
+        gr = tanner_init()
+        # Work on lists, which is faster and also works for codes backed by
+        # NumPy arrays (see from_arrays).
+        sched_start, sched_len = self.schedule_start.tolist(), self.schedule_len.tolist()
+        sched_data = self.schedule_data.tolist()
+        colors, plaquettes = self.check_colors.tolist(), self.check_plaquettes.tolist()
+        nodes = []
+        for (node, s, k) in zip(self.node_ids.tolist(), self.node_types.tolist(), self.node_pos.tolist()):
+            attrs = {'node_type': NODE_TYPES[s]}
+            if s != 0:
+                if sched_len[k] >= 0:
+                    start = sched_start[k]
+                    attrs['schedule_order'] = [None if q < 0 else q for q in sched_data[start:start+sched_len[k]]]
+                if colors[k] >= 0:
+                    attrs['color'] = colors[k]
+                if plaquettes[k] >= 0:
+                    attrs['plaquette'] = plaquettes[k]
+            attrs.update(self.node_attrs.get(node, {}))
+            nodes.append((node, attrs))
+        gr.add_nodes_from(nodes)
+
+        data_qubits = self.data_qubits.tolist()
+        check_ids = self.check_ids.tolist()
+        indptr, indices = self.support_indptr.tolist(), self.support_indices.tolist()
+        gr.add_edges_from((ch, data_qubits[j])
+                            for (k, ch) in enumerate(check_ids) for j in indices[indptr[k]:indptr[k+1]])
+        gr.graph['data_qubits'] = data_qubits
+        gr.graph['data_qubit_index'] = {q: i for (i, q) in enumerate(data_qubits)}
+        for (k, (ch, s)) in enumerate(zip(check_ids, self.check_types.tolist())):
+            gr.graph['checks']['all'].append(ch)
+            gr.graph['checks'][NODE_TYPES[s]].append(ch)
+            pcm = gr.graph['pcm'][NODE_TYPES[s]]
+            pcm['indices'].extend(indices[indptr[k]:indptr[k+1]])
+            pcm['indptr'].append(len(pcm['indices']))
+        for s in ['x', 'z']:
+            gr.graph['obs_list'][s] = self.obs_list(s)
+        for p in self.plaquette_ids.tolist():
+            add_plaquette(gr, p, self.get_plaquette_support(p), self.get_plaquette_color(p))
+        pairs = self.plaquette_check_pairs.tolist()
+        for i in range(0, len(pairs), 2):
+            gr.graph['plaquette_check_map'][pairs[i]].append(pairs[i+1])
+        gr.graph.update(self.graph_attrs)
+        return gr
+
+def gather_csr_rows(indptr: np.ndarray, indices: np.ndarray, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Returns the CSR arrays (indptr, indices) of the given rows of a CSR
+        matrix, in the given order.
+    """
+    lengths = indptr[rows+1] - indptr[rows]
+    out_indptr = np.zeros(len(rows)+1, dtype=np.int64)
+    np.cumsum(lengths, out=out_indptr[1:])
+    offsets = np.repeat(indptr[rows] - out_indptr[:-1], lengths)
+    return out_indptr, indices[np.arange(out_indptr[-1], dtype=np.int64) + offsets]
@@ -0,0 +1,96 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Detector error models of memory experiments. Since computing a DEM is
+    the most expensive step before decoding, results can be cached on disk
+    under a hash of everything that determines the circuit.
+"""
+
+from qonstruct.code_builder.base import *
+from qonstruct.qes.manager import QesManager
+from qonstruct.qes.noise import NoiseModel
+from qonstruct.cache import *
+
+import networkx as nx
+
+import hashlib
+import json
+
+DEM_CACHE_VERSION = 2
+
+def get_detector_error_model(tanner_graph: nx.Graph,
+                                rounds: int,
+                                noise: NoiseModel,
+                                memory: str = 'z',
+                                flag_min_weight: int = None,
+                                decompose_errors=True,
+                                cache_dir: str = None,
+                                cache_max_bytes: int = DEFAULT_MAX_BYTES) -> 'stim.DetectorErrorModel':
+    """
+        Returns the detector error model of the memory experiment that
+        QesManager writes for the (scheduled) Tanner graph, with the given
+        number of rounds, noise and memory basis. Flags stored in the graph
+        are used; if flag_min_weight is set, the remaining checks of at least
+        that weight are flagged with QesManager.assign_flags, on a copy of the
+        graph.
+
+        With decompose_errors, each error is split into components with at
+        most two detectors, as matching decoders need. This fails for color
+        codes, whose errors can flip three detectors of one round; pass
+        decompose_errors=False for them.
+
+        If cache_dir is set, the DEM is cached there (see cache.py) under
+        detector_error_model_key, so a later call with the same inputs only
+        reads it back.
+    """
+    import stim
+    # Flags are assigned first, so that the key covers them.
+    if flag_min_weight is not None:
+        tanner_graph = tanner_graph.copy()
+    mgr = QesManager(tanner_graph)
+    mgr.memory = memory
+    mgr.noise = noise
+    if flag_min_weight is not None:
+        mgr.assign_flags(flag_min_weight)
+    if cache_dir is not None:
+        key = 'dem-%s' % detector_error_model_key(tanner_graph, rounds, noise, memory, decompose_errors)
+        data = cache_load(cache_dir, key)
+        if data is not None:
+            try:
+                return stim.DetectorErrorModel(data.decode())
+            except (ValueError, IndexError, UnicodeDecodeError):
+                cache_remove(cache_dir, key)
+    dem = mgr.stim_circuit(rounds).detector_error_model(decompose_errors=decompose_errors)
+
+    if cache_dir is not None:
+        cache_store(cache_dir, key, str(dem).encode(), cache_max_bytes)
+    return dem
+
+def detector_error_model_key(tanner_graph: nx.Graph,
+                                rounds: int,
+                                noise: NoiseModel,
+                                memory: str = 'z',
+                                decompose_errors=True) -> str:
+    """
+        Returns a hash of the inputs of get_detector_error_model: the checks
+        (see tanner_graph_fingerprint), the data qubits and observables, and
+        the schedule order, color and flags of each check, along with the
+        remaining arguments. Flags must already be assigned, since the key
+        does not depend on flag_min_weight.
+    """
+    checks = tanner_graph.graph['checks']['all']
+    content = {
+        'version': DEM_CACHE_VERSION,
+        'fingerprint': tanner_graph_fingerprint(tanner_graph),
+        'data_qubits': tanner_graph.graph['data_qubits'],
+        'observables': tanner_graph.graph['obs_list'][memory],
+        'schedules': [tanner_graph.nodes[ch]['schedule_order'] for ch in checks],
+        'colors': [tanner_graph.nodes[ch].get('color') for ch in checks],
+        'flags': [tanner_graph.nodes[ch].get('flags', []) for ch in checks],
+        'rounds': rounds,
+        'noise': list(noise.params()),
+        'memory': memory,
+        'decompose_errors': decompose_errors
+    }
+    return hashlib.sha256(json.dumps(content, default=int).encode()).hexdigest()
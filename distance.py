@@ -1,42 +1,166 @@
+from qonstruct.code_builder.base import *
+from qonstruct.utils import null, row
+
+import numpy as np
 import stim
 
-def add_operator(circuit, arr, is_x):
-    targets = []
-    for (i, q) in enumerate(arr):
-        targets.append(stim.target_x(q) if is_x else stim.target_z(q))
-        if i < len(arr)-1:
-            targets.append(stim.target_combiner())
-    circuit.append("MPP", targets)
+from concurrent.futures import ProcessPoolExecutor
+
+def compute_distance(gr, is_x, max_detection_event_set_size=3, max_edge_degree=3):
+    """
+        Returns the weight of the lowest-weight logical operator found by stim
+        (0 if none is found within the pruning limits). If is_x, this is a Z
+        operator that commutes with the X checks and flips an X observable.
+    """
+    return len(find_min_weight_logical(gr, is_x, max_detection_event_set_size, max_edge_degree))
+
+def find_min_weight_logical(gr, is_x, max_detection_event_set_size=3, max_edge_degree=3) -> list[int]:
+    """
+        Returns the data qubits of the lowest-weight logical operator found by
+        stim's search_for_undetectable_logical_errors. The pruning limits are
+        passed to the search as dont_explore_detection_event_sets_with_size_above
+        and dont_explore_edges_with_degree_above.
+    """
+    circuit = make_distance_circuit(gr, is_x)
+    errors = circuit.search_for_undetectable_logical_errors(
+                dont_explore_edges_increasing_symptom_degree=False,
+                dont_explore_detection_event_sets_with_size_above=max_detection_event_set_size,
+                dont_explore_edges_with_degree_above=max_edge_degree)
+    logical = []
+    for err in errors:
+        loc = err.circuit_error_locations[0]
+        logical.extend(t.gate_target.value for t in loc.flipped_pauli_product)
+    return sorted(logical)
+
+def compute_code_distances(gr, processes=2, max_detection_event_set_size=3, max_edge_degree=3) -> dict:
+    """
+        Runs the X and Z searches (in separate processes if processes > 1).
+        Returns {'x': (distance, logical), 'z': (distance, logical)}, where
+        the 'x' entry comes from compute_distance(gr, True).
+    """
+    args = [(gr, is_x, max_detection_event_set_size, max_edge_degree) for is_x in [True, False]]
+    if processes > 1:
+        with ProcessPoolExecutor(min(processes, 2)) as executor:
+            logicals = list(executor.map(_find_min_weight_logical, args))
+    else:
+        logicals = [_find_min_weight_logical(a) for a in args]
+    return {s: (len(logical), logical) for (s, logical) in zip(['x', 'z'], logicals)}
 
-def measure_checks(circuit, gr):
-    for ch in gr.graph['checks']['all']:
-        add_operator(circuit, list(gr.neighbors(ch)), gr.nodes[ch]['node_type'] == 'x')
+def _find_min_weight_logical(args: tuple) -> list[int]:
+    return find_min_weight_logical(*args)
 
-def measure_logical_qubits(circuit, gr, is_x):
+def make_distance_circuit(gr, is_x) -> stim.Circuit:
+    """
+        Builds the circuit searched by compute_distance: measure the
+        observables and all checks, apply errors on the data qubits, then
+        measure the checks and observables again. The checks are read from
+        the parity-check arrays of the graph and the circuit is assembled as
+        text in one pass.
+    """
     typ = 'x' if is_x else 'z'
-    for (i, obs) in enumerate(gr.graph['obs_list'][typ]):
-        add_operator(circuit, obs, is_x)
-        circuit.append('OBSERVABLE_INCLUDE', [stim.target_rec(-1)], i)
-
-def compute_distance(gr, is_x):
-    circuit = stim.Circuit()
-    measure_logical_qubits(circuit, gr, is_x)
-    measure_checks(circuit, gr)
+    data_qubits = np.array(gr.graph['data_qubits'])
+    products = {}
+    for s in ['x', 'z']:
+        indptr, indices = get_parity_check_csr(gr, s)
+        qubits = data_qubits[indices].tolist()
+        P = s.upper()
+        products[s] = [P + ('*'+P).join(map(str, qubits[indptr[i]:indptr[i+1]])) for i in range(len(indptr)-1)]
+    # Put the checks back in the order of gr.graph['checks']['all'].
+    ctr = {'x': 0, 'z': 0}
+    check_products, detected = [], []
+    for (i, ch) in enumerate(gr.graph['checks']['all']):
+        s = gr.nodes[ch]['node_type']
+        check_products.append(products[s][ctr[s]])
+        ctr[s] += 1
+        if s == typ:
+            detected.append(i)
+    n_checks = len(check_products)
+    P = typ.upper()
+    obs_products = [P + ('*'+P).join(map(str, obs)) for obs in gr.graph['obs_list'][typ]]
+
+    lines = []
+    def measure_observables():
+        if len(obs_products) == 0:
+            return
+        lines.append('MPP ' + ' '.join(obs_products))
+        n_obs = len(obs_products)
+        lines.extend('OBSERVABLE_INCLUDE(%d) rec[%d]' % (i, i-n_obs) for i in range(n_obs))
+    def measure_checks():
+        if n_checks > 0:
+            lines.append('MPP ' + ' '.join(check_products))
+    measure_observables()
+    measure_checks()
     # Inject error on the data qubits.
-    if is_x:
-        circuit.append('Z_ERROR', list(gr.graph['data_qubits']), 0.1)
-    else:
-        circuit.append('X_ERROR', list(gr.graph['data_qubits']), 0.1)
+    lines.append('%s_ERROR(0.1) %s' % ('Z' if is_x else 'X', ' '.join(map(str, data_qubits.tolist()))))
     # Measure checks and then the logical qubits.
-    measure_checks(circuit, gr)
-    n_checks = len(gr.graph['checks']['all'])
-    t = 'x' if is_x else 'z'
-    for (i, ch) in enumerate(gr.graph['checks']['all']):
-        if gr.nodes[ch]['node_type'] == t:
-            circuit.append('DETECTOR', [stim.target_rec(-(n_checks-i)), stim.target_rec(-(2*n_checks-i))])
-    measure_logical_qubits(circuit, gr, is_x)
-    errors = circuit.search_for_undetectable_logical_errors(
-                dont_explore_edges_increasing_symptom_degree=False,
-                dont_explore_detection_event_sets_with_size_above=3,
-                dont_explore_edges_with_degree_above=3)
-    return len(errors)
\ No newline at end of file
+    measure_checks()
+    lines.extend('DETECTOR rec[%d] rec[%d]' % (i-n_checks, i-2*n_checks) for i in detected)
+    measure_observables()
+    return stim.Circuit('\n'.join(lines))
+
+def estimate_distance(gr, is_x, trials=100, processes=1, seed=None) -> tuple[int, list[int], list[int]]:
+    """
+        Randomized information-set estimate of the distance, for codes that
+        are too large for compute_distance. Each trial permutes the data
+        qubits at random and takes the null-space basis of the permuted
+        parity-check matrix, whose vectors are low weight on the permuted
+        information set; the lightest one that is a nontrivial logical is
+        kept. The result is an upper bound on the distance.
+
+        As in compute_distance, if is_x this looks for Z operators that
+        commute with the X checks. Trials are split across processes if
+        processes > 1. Returns (weight, logical, trace), where logical lists
+        the data qubits of the best operator and trace[i] is the best weight
+        after i+1 trials (0 while nothing has been found).
+    """
+    H = get_parity_check_matrix(gr, 'x' if is_x else 'z', 'dense')
+    H_dual = get_parity_check_matrix(gr, 'z' if is_x else 'x', 'dense')
+    # An operator in ker(H) is nontrivial iff it anticommutes with a logical
+    # of the other type: a vector of ker(H_dual) outside the row space of H.
+    stabilizers = row(H)
+    logicals = row(np.vstack([stabilizers, null(H_dual)]))[len(stabilizers):]
+
+    seeds = np.random.SeedSequence(seed).spawn(max(processes, 1))
+    chunks = [(H, logicals, trials//len(seeds) + (i < trials % len(seeds)), s) for (i, s) in enumerate(seeds)]
+    if processes > 1:
+        with ProcessPoolExecutor(processes) as executor:
+            results = list(executor.map(_isd_trials, chunks))
+    else:
+        results = [_isd_trials(c) for c in chunks]
+
+    best, trace = None, []
+    for (vec, chunk_trace) in results:
+        if vec is not None and (best is None or vec.sum() < best.sum()):
+            best = vec
+        prev = trace[-1] if len(trace) > 0 else None
+        for w in chunk_trace:
+            if prev is None or (w is not None and w < prev):
+                prev = w
+            trace.append(prev)
+    if best is None:
+        return 0, [], [0 for _ in trace]
+    data_qubits = gr.graph['data_qubits']
+    logical = [data_qubits[j] for j in np.flatnonzero(best)]
+    return len(logical), logical, [0 if w is None else w for w in trace]
+
+def _isd_trials(args: tuple) -> tuple[np.ndarray, list[int]]:
+    H, logicals, trials, seed = args
+    rng = np.random.default_rng(seed)
+    n = H.shape[1]
+    L = logicals.T.astype(np.uint8)
+    best, best_w, trace = None, None, []
+    for _ in range(trials):
+        perm = rng.permutation(n)
+        basis = null(H[:, perm])
+        candidates = np.zeros_like(basis)
+        candidates[:, perm] = basis
+        # uint8 sums wrap at 256, which keeps their parity.
+        nontrivial = ((candidates.astype(np.uint8) @ L) % 2).any(axis=1)
+        if nontrivial.any():
+            w = candidates.sum(axis=1)
+            w[~nontrivial] = n+1
+            i = int(np.argmin(w))
+            if best_w is None or w[i] < best_w:
+                best, best_w = candidates[i], int(w[i])
+        trace.append(best_w)
+    return best, trace
@@ -0,0 +1,72 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Bit-packed linear algebra over GF(2). Rows of a binary matrix are packed
+    into uint64 words (column j lives in bit j%64 of word j//64), so a row
+    operation touches ncols/64 words instead of ncols bools, and elimination
+    XORs the pivot row into every affected row at once.
+"""
+
+import numpy as np
+
+WORD_BITS = 64
+WORD_DTYPE = np.dtype('<u8')
+
+def pack(m: np.ndarray) -> np.ndarray:
+    """
+        Packs a binary matrix into an array of shape (rows, ceil(cols/64)).
+    """
+    m = np.asarray(m, dtype=bool)
+    nrows, ncols = m.shape
+    nwords = (ncols + WORD_BITS - 1) // WORD_BITS
+    b = np.zeros((nrows, nwords*8), dtype=np.uint8)
+    b[:, :(ncols+7)//8] = np.packbits(m, axis=1, bitorder='little')
+    return b.view(WORD_DTYPE)
+
+def unpack(w: np.ndarray, ncols: int) -> np.ndarray:
+    """
+        Inverse of pack: returns a (rows, ncols) bool matrix.
+    """
+    b = np.ascontiguousarray(w, dtype=WORD_DTYPE).view(np.uint8)
+    return np.unpackbits(b, axis=1, count=ncols, bitorder='little').astype(bool)
+
+def rref_packed(w: np.ndarray, ncols: int) -> tuple[np.ndarray, list[int]]:
+    """
+        Computes the RREF of a packed matrix. Returns the packed RREF and the
+        pivot columns.
+    """
+    w = w.copy()
+    nrows = w.shape[0]
+    pivots = []
+    r = 0
+    for p in range(ncols):
+        if r == nrows:
+            break
+        k, bit = p // WORD_BITS, np.uint64(1 << (p % WORD_BITS))
+        nz = np.flatnonzero(w[r:, k] & bit)
+        if nz.size == 0:
+            continue
+        i = r + int(nz[0])
+        if i != r:
+            w[[r, i]] = w[[i, r]]
+        # Rows at or below r are zero before column p, so only words k and
+        # onward of the pivot row can be nonzero.
+        rows = np.flatnonzero(w[:, k] & bit)
+        rows = rows[rows != r]
+        if rows.size > 0:
+            w[rows, k:] ^= w[r, k:]
+        pivots.append(p)
+        r += 1
+    return w, pivots
+
+def rref(m: np.ndarray) -> tuple[np.ndarray, list[int]]:
+    """
+        Returns the RREF of m (with the same dtype as m) and the pivot columns.
+    """
+    w, pivots = rref_packed(pack(m), m.shape[1])
+    return unpack(w, m.shape[1]).astype(m.dtype, copy=False), pivots
+
+def rank(m: np.ndarray) -> int:
+    _, pivots = rref_packed(pack(m), m.shape[1])
+    return len(pivots)
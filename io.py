@@ -4,8 +4,22 @@
 """
 
 from qonstruct.code_builder.base import *
+from qonstruct.code_builder.tanner_code import *
 
 import networkx as nx
+import numpy as np
+
+import json
+import struct
+
+# Binary format: a fixed preamble (magic, version, header length, offset of
+# the array section), a JSON header describing the arrays, and then the raw
+# little-endian arrays of a TannerCode, each aligned to BINARY_ALIGNMENT
+# bytes so they can be memory-mapped in place.
+BINARY_MAGIC = b'QTANNER\0'
+BINARY_VERSION = 1
+BINARY_ALIGNMENT = 64
+_PREAMBLE = struct.Struct('<8sIIQ')
 
 def read_tanner_graph_file(input_file: str) -> nx.Graph:
     """
@@ -21,53 +35,195 @@ def read_tanner_graph_file(input_file: str) -> nx.Graph:
             X2,0,2,4
             OZ0,0,1,3
             OX0,0,2,3
+
+        Lines beginning with an '@' are optional metadata, which refer to
+        checks by their label (e.g. X0):
+            @schedule,<check>,<data-qubit or ->,...     schedule order ('-' is None)
+            @color,<check>,<color>
+            @flag,<check>,<data-qubit>,<data-qubit>     see add_flags_to
+            @plaquette,<plaquette>,<color or ->,<data-qubit or ->,...
+            @check_plaquette,<check>,<plaquette>
+        Plaquettes are defined before checks are assigned to them. Unknown
+        metadata lines are ignored.
+
+        The file may be gzip or xz compressed. To avoid building the
+        networkx graph, use read_tanner_code_file.
     """
-    reader = open(input_file, 'r')
-    lines = reader.readlines()
+    return read_tanner_code_file(input_file).to_graph()
+
+def read_tanner_code_file(input_file: str, chunk_size: int = 1 << 20) -> TannerCode:
+    """
+        Reads a Tanner graph file (see read_tanner_graph_file) into a
+        TannerCode, without creating a networkx graph. The file is read in
+        chunks of about chunk_size bytes, and the integers of each chunk are
+        parsed at once by NumPy. Gzip and xz compressed files are detected
+        and decompressed on the fly.
+
+        As in read_tanner_graph_file, data qubits are added in order of first
+        appearance, and the checks are numbered from one past the largest
+        data qubit, X checks before Z checks.
+    """
+    # Per line: kind and number of qubit indices, and the indices themselves.
+    kinds, counts, values = [], [], []
+    # Labels of the check lines and the (split) metadata lines.
+    labels, metadata = {'x': [], 'z': []}, []
+    reader = _open_text(input_file)
+    while True:
+        lines = reader.readlines(chunk_size)
+        if len(lines) == 0:
+            break
+        k = len(counts)
+        rests = []
+        for ln in lines:
+            ln = ln.strip()
+            if len(ln) == 0:
+                continue
+            if ln[0] == '@':
+                metadata.append(ln.replace(' ', '').split(','))
+                continue
+            head, _, rest = ln.partition(',')
+            if head[0] == 'O':
+                kinds.append(_LINE_OBS_X if head[1] in 'Xx' else _LINE_OBS_Z)
+            else:
+                kinds.append(_LINE_X if head[0] in 'Xx' else _LINE_Z)
+                labels['x' if head[0] in 'Xx' else 'z'].append(_check_label(head))
+            if len(rest) > 0:
+                counts.append(rest.count(',')+1)
+                rests.append(rest)
+            else:
+                counts.append(0)
+        try:
+            chunk = np.fromstring(','.join(rests), dtype=np.int64, sep=',')
+        except ValueError:
+            chunk = None
+        if chunk is None or len(chunk) != sum(counts[k:]):
+            reader.close()
+            raise ValueError('%s: could not parse qubit indices' % input_file)
+        values.append(chunk)
     reader.close()
+    values = np.concatenate(values) if len(values) > 0 else np.zeros(0, dtype=np.int64)
+    code = _make_tanner_code(np.array(kinds, dtype=np.int8), np.array(counts, dtype=np.int64), values)
+    if len(metadata) > 0:
+        check_map = dict(zip(labels['x'] + labels['z'], code.check_ids.tolist()))
+        _apply_metadata(code, metadata, check_map, input_file)
+    return code
 
-    gr = tanner_init()
-
-    n = 0
-    check_list_map = {'x': [], 'z': []}
-    for ln in lines:
-        line_data = ln.split(',')
-        ch_s = line_data[0]
-        # Get type:
-        support = [int(x) for x in line_data[1:]]
-        for x in support:
-            if not gr.has_node(x):
-                add_data_qubit(gr, x)
-                n = max(n, x)
-        if ch_s[0] == 'O':
-            # This is an observable.
-            node_type = 'x' if ch_s[1] == 'X' or ch_s[1] == 'x' else 'z'
-            add_observable(gr, support, node_type)
-        else:
-            node_type = 'x' if ch_s[0] == 'X' or ch_s[0] == 'x' else 'z'
-            check_list_map[node_type].append(support)
-    n = n+1
-    for s in ['x', 'z']:
-        for support in check_list_map[s]:
-            add_check(gr, n, s, support)
-            n += 1
+def _check_label(label: str) -> str:
+    return label if label[0] in 'XZ' else label[0].upper() + label[1:]
 
-    return gr
+def _apply_metadata(code: TannerCode, metadata: list[list[str]], check_map: dict[str, int], input_file: str) -> None:
+    def check(label: str) -> int:
+        ch = check_map.get(label)
+        if ch is None:
+            ch = check_map.get(_check_label(label))
+            if ch is None:
+                raise ValueError('%s: unknown check %s in metadata' % (input_file, label))
+        return ch
+
+    def qubits(fields: list[str]) -> list[int|None]:
+        return [None if x == '-' else int(x) for x in fields]
+
+    memberships = []
+    for fields in metadata:
+        key = fields[0]
+        if key == '@schedule':
+            code.set_schedule_order(check(fields[1]), qubits(fields[2:]))
+        elif key == '@color':
+            code.set_color(check(fields[1]), int(fields[2]))
+        elif key == '@flag':
+            code.add_flags_to(int(fields[2]), int(fields[3]), check(fields[1]))
+        elif key == '@plaquette':
+            color = None if fields[2] == '-' else int(fields[2])
+            code.add_plaquette(int(fields[1]), qubits(fields[3:]), color)
+        elif key == '@check_plaquette':
+            memberships.append((check(fields[1]), int(fields[2])))
+    for (ch, p) in memberships:
+        code.set_plaquette(ch, p)
+
+_LINE_X, _LINE_Z, _LINE_OBS_X, _LINE_OBS_Z = 0, 1, 2, 3
+
+def _make_tanner_code(kinds: np.ndarray, counts: np.ndarray, values: np.ndarray) -> TannerCode:
+    line_indptr = np.zeros(len(counts)+1, dtype=np.int64)
+    np.cumsum(counts, out=line_indptr[1:])
+    # Data qubits in order of first appearance, and the position of each
+    # value among them.
+    uniq, first, inverse = np.unique(values, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind='stable')
+    rank = np.empty(len(uniq), dtype=np.int64)
+    rank[order] = np.arange(len(uniq), dtype=np.int64)
+    data_qubits = uniq[order]
+    positions = rank[inverse.reshape(-1)]
+    n_data = len(data_qubits)
+    n = max(0, int(data_qubits.max()) if n_data > 0 else 0) + 1
+
+    check_rows = np.concatenate([np.flatnonzero(kinds == _LINE_X), np.flatnonzero(kinds == _LINE_Z)])
+    indptr, indices = gather_csr_rows(line_indptr, positions, check_rows)
+    # Drop repeated qubits within a check (as add_check does).
+    rows = np.repeat(np.arange(len(check_rows), dtype=np.int64), np.diff(indptr))
+    _, keep = np.unique(rows*max(n_data, 1) + indices, return_index=True)
+    if len(keep) != len(indices):
+        keep.sort()
+        rows, indices = rows[keep], indices[keep]
+        indptr = np.zeros(len(check_rows)+1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(check_rows)), out=indptr[1:])
+    n_checks = len(check_rows)
+    n_x = int(np.count_nonzero(kinds == _LINE_X))
+
+    arrays = {name: np.zeros(0, dtype=ARRAY_DTYPES[typecode]) for (name, typecode) in ARRAY_FIELDS.items()}
+    check_ids = np.arange(n, n+n_checks, dtype=np.int64)
+    arrays['node_ids'] = np.concatenate([data_qubits, check_ids])
+    arrays['node_types'] = np.repeat(np.array([0, NODE_TYPE_CODES['x'], NODE_TYPE_CODES['z']], dtype=np.int8),
+                                        [n_data, n_x, n_checks-n_x])
+    arrays['node_pos'] = np.concatenate([np.arange(n_data, dtype=np.int64), np.arange(n_checks, dtype=np.int64)])
+    arrays['data_qubits'] = data_qubits
+    arrays['check_ids'] = check_ids
+    arrays['check_types'] = arrays['node_types'][n_data:]
+    arrays['support_indptr'] = indptr
+    arrays['support_indices'] = indices
+    arrays['schedule_start'] = np.zeros(n_checks, dtype=np.int64)
+    arrays['schedule_len'] = np.zeros(n_checks, dtype=np.int64)
+    arrays['check_colors'] = np.full(n_checks, -1, dtype=np.int64)
+    arrays['check_plaquettes'] = np.full(n_checks, -1, dtype=np.int64)
+    arrays['plaquette_indptr'] = np.zeros(1, dtype=np.int64)
+    for (s, kind) in [('x', _LINE_OBS_X), ('z', _LINE_OBS_Z)]:
+        obs_indptr, obs_indices = gather_csr_rows(line_indptr, values, np.flatnonzero(kinds == kind))
+        arrays['obs_indptr_%s' % s] = obs_indptr
+        arrays['obs_indices_%s' % s] = obs_indices
+    return TannerCode.from_arrays(arrays)
+
+def _open_text(input_file: str):
+    """
+        Opens a text file for reading, decompressing it if it is gzip or xz
+        compressed (detected from the first bytes of the file).
+    """
+    with open(input_file, 'rb') as reader:
+        magic = reader.read(6)
+    if magic.startswith(b'\x1f\x8b'):
+        import gzip
+        return gzip.open(input_file, 'rt')
+    if magic.startswith(b'\xfd7zXZ\x00'):
+        import lzma
+        return lzma.open(input_file, 'rt')
+    return open(input_file, 'r')
 
 def write_tanner_graph_file(tanner_graph: nx.Graph, output_file: str) -> None:
     """
-        This code will write a Tanner graph to an output file.
+        This code will write a Tanner graph to an output file. Schedule
+        orders, colors, flags and plaquettes are written as metadata lines
+        (see read_tanner_graph_file).
     """
     writer = open(output_file, 'w')
     # Map data qubit nodes to indices.
     x_ctr, z_ctr = 0, 0
+    labels = {}
     for s in tanner_graph.graph['checks']['all']:
         if tanner_graph.nodes[s]['node_type'] == 'x':
-            writer.write('X%d' % x_ctr)
+            labels[s] = 'X%d' % x_ctr
             x_ctr += 1
         else:
-            writer.write('Z%d' % z_ctr)
+            labels[s] = 'Z%d' % z_ctr
             z_ctr += 1
+        writer.write(labels[s])
         for d in tanner_graph.neighbors(s):
             writer.write(',%d' % d)
         writer.write('\n')
@@ -83,5 +239,95 @@ def write_tanner_graph_file(tanner_graph: nx.Graph, output_file: str) -> None:
         for d in obs:
             writer.write(',%d' % d)
         writer.write('\n')
+    # Write metadata (schedules, colors, flags and plaquettes).
+    def qubits(arr: list[int|None]) -> str:
+        return ','.join('-' if q is None else str(q) for q in arr)
+    for s in tanner_graph.graph['checks']['all']:
+        attrs = tanner_graph.nodes[s]
+        if len(attrs.get('schedule_order', [])) > 0:
+            writer.write('@schedule,%s,%s\n' % (labels[s], qubits(attrs['schedule_order'])))
+        if attrs.get('color') is not None:
+            writer.write('@color,%s,%d\n' % (labels[s], attrs['color']))
+        for (q1, q2) in attrs.get('flags', []):
+            writer.write('@flag,%s,%d,%d\n' % (labels[s], q1, q2))
+    for p in tanner_graph.graph['plaquettes']:
+        color = tanner_graph.graph['plaquette_color_map'][p]
+        writer.write('@plaquette,%d,%s,%s\n' % (p, '-' if color is None else str(color),
+                                                qubits(tanner_graph.graph['plaquette_support_map'][p])))
+    for (p, checks) in tanner_graph.graph['plaquette_check_map'].items():
+        for s in checks:
+            writer.write('@check_plaquette,%s,%d\n' % (labels[s], p))
+    writer.close()
+
+
+def write_tanner_graph_binary(tanner_graph: nx.Graph|TannerCode, output_file: str) -> None:
+    """
+        Writes a Tanner graph (or TannerCode) in the binary format. This
+        stores both parity-check matrices, the observables, schedule orders,
+        and plaquette and color data. Other node and graph attributes are
+        stored in the header, so they must be JSON-serializable.
+    """
+    code = tanner_graph if isinstance(tanner_graph, TannerCode) else TannerCode.from_graph(tanner_graph)
+    arrays = code.to_arrays()
+    specs, offset = {}, 0
+    for (name, arr) in arrays.items():
+        specs[name] = {'dtype': arr.dtype.str, 'length': len(arr), 'offset': offset}
+        offset += _align(arr.nbytes)
+    header = json.dumps({
+        'arrays': specs,
+        'node_attrs': [[q, attrs] for (q, attrs) in code.node_attrs.items()],
+        'graph_attrs': code.graph_attrs
+    }).encode()
+    data_offset = _align(_PREAMBLE.size + len(header))
+
+    writer = open(output_file, 'wb')
+    writer.write(_PREAMBLE.pack(BINARY_MAGIC, BINARY_VERSION, len(header), data_offset))
+    writer.write(header)
+    writer.write(bytes(data_offset - _PREAMBLE.size - len(header)))
+    for arr in arrays.values():
+        writer.write(arr.tobytes())
+        writer.write(bytes(_align(arr.nbytes) - arr.nbytes))
     writer.close()
 
+def read_tanner_code_binary(input_file: str, mmap=True) -> TannerCode:
+    """
+        Reads a TannerCode from the binary format. If mmap is True, the arrays
+        are memory-mapped instead of read, so even large codes open
+        immediately; the returned code is then read-only (see
+        TannerCode.from_arrays).
+    """
+    reader = open(input_file, 'rb')
+    preamble = reader.read(_PREAMBLE.size)
+    if len(preamble) < _PREAMBLE.size:
+        reader.close()
+        raise ValueError('%s is not a Tanner graph binary file' % input_file)
+    magic, version, header_len, data_offset = _PREAMBLE.unpack(preamble)
+    if magic != BINARY_MAGIC:
+        reader.close()
+        raise ValueError('%s is not a Tanner graph binary file' % input_file)
+    if version != BINARY_VERSION:
+        reader.close()
+        raise ValueError('%s has unsupported binary format version %d' % (input_file, version))
+    header = json.loads(reader.read(header_len))
+    reader.close()
+
+    if mmap:
+        buf = np.memmap(input_file, dtype=np.uint8, mode='r')
+    else:
+        buf = np.fromfile(input_file, dtype=np.uint8)
+    arrays = {}
+    for (name, spec) in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        start = data_offset + spec['offset']
+        arrays[name] = buf[start:start + spec['length']*dtype.itemsize].view(dtype)
+    node_attrs = {q: attrs for (q, attrs) in header['node_attrs']}
+    return TannerCode.from_arrays(arrays, node_attrs, header['graph_attrs'], copy=not mmap)
+
+def read_tanner_graph_binary(input_file: str) -> nx.Graph:
+    """
+        Reads a Tanner graph from the binary format.
+    """
+    return read_tanner_code_binary(input_file).to_graph()
+
+def _align(n: int) -> int:
+    return (n + BINARY_ALIGNMENT - 1) // BINARY_ALIGNMENT * BINARY_ALIGNMENT
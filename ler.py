@@ -0,0 +1,331 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Logical error rate estimation by sampling. Detection events are sampled
+    with stim (bit-packed) in batches, which are decoded and checked
+    against the sampled observables. Batches run on a process pool, and
+    sampling stops once the estimate is precise enough (target relative
+    error) or enough failures have been seen.
+
+    Decoders are pluggable: a decoder is a class (or function) that takes a
+    stim.DetectorErrorModel and returns an object whose decode_batch maps
+    bit-packed detection events (shots x ceil(detectors/8) bytes) to
+    bit-packed observable predictions, as in pymatching. Its
+    decompose_errors attribute says whether it needs the DEM's errors split
+    into graphlike components (default: True).
+"""
+
+from qonstruct.dem import get_detector_error_model
+from qonstruct.qes.manager import QesManager
+from qonstruct.qes.noise import NoiseModel
+from qonstruct.cache import DEFAULT_MAX_BYTES
+from qonstruct.restriction import RestrictionDecoder
+
+import networkx as nx
+import numpy as np
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import importlib.util
+import math
+import os
+import time
+
+# The number of decoded syndromes kept by MwpmDecoder.
+MAX_CACHED_SYNDROMES = 1 << 16
+
+class MwpmDecoder:
+    """
+        Reference minimum-weight perfect matching decoder, with no
+        dependencies beyond networkx. Detectors are the nodes of a graph
+        (plus a boundary node) whose edges are the DEM's graphlike errors,
+        weighted by log((1-p)/p). Shortest paths are computed on demand and
+        kept, as are the predictions of the last MAX_CACHED_SYNDROMES
+        syndromes seen (the least recently used ones are dropped).
+
+        This is slow next to pymatching and is meant for small codes and
+        for checking other decoders.
+    """
+    decompose_errors = True
+
+    def __init__(self, dem: 'stim.DetectorErrorModel'):
+        self.n_detectors = dem.num_detectors
+        self.n_observables = dem.num_observables
+        self.boundary = self.n_detectors
+        self.graph = nx.Graph()
+        self.graph.add_nodes_from(range(self.n_detectors + 1))
+        for (u, v, p, mask) in _graphlike_errors(dem, self.boundary):
+            if self.graph.has_edge(u, v):
+                e = self.graph.edges[u, v]
+                if e['obs'] == mask:
+                    # Independent errors with the same effect.
+                    p = e['p']*(1-p) + p*(1-e['p'])
+                elif p <= e['p']:
+                    continue
+            self.graph.add_edge(u, v, p=p, obs=mask, weight=_error_weight(p))
+        self._paths = {}
+        self._predictions = OrderedDict()
+
+    def decode_batch(self, detectors: np.ndarray) -> np.ndarray:
+        out = np.zeros((detectors.shape[0], (self.n_observables+7)//8), dtype=np.uint8)
+        for i in np.flatnonzero(detectors.any(axis=1)):
+            key = detectors[i].tobytes()
+            if key in self._predictions:
+                self._predictions.move_to_end(key)
+            else:
+                fired = np.flatnonzero(np.unpackbits(detectors[i], bitorder='little')[:self.n_detectors])
+                mask = self.decode(fired.tolist())
+                bits = [(mask >> k) & 1 for k in range(self.n_observables)]
+                self._predictions[key] = np.packbits(np.array(bits, dtype=np.uint8), bitorder='little')
+                if len(self._predictions) > MAX_CACHED_SYNDROMES:
+                    self._predictions.popitem(last=False)
+            out[i] = self._predictions[key]
+        return out
+
+    def decode(self, fired: list[int]) -> int:
+        """
+            Returns the observables flipped by the matching of the fired
+            detectors, as a bitmask.
+        """
+        k = len(fired)
+        # Each detector may match to its own copy of the boundary, and the
+        # copies match each other for free.
+        gr = nx.Graph()
+        for i in range(k):
+            dist, _ = self._shortest_paths(fired[i])
+            if self.boundary in dist:
+                gr.add_edge(i, k+i, weight=dist[self.boundary])
+            for j in range(i+1, k):
+                if fired[j] in dist:
+                    gr.add_edge(i, j, weight=dist[fired[j]])
+                gr.add_edge(k+i, k+j, weight=0)
+        mask = 0
+        for (a, b) in nx.min_weight_matching(gr):
+            a, b = min(a, b), max(a, b)
+            if a >= k:
+                continue
+            _, obs = self._shortest_paths(fired[a])
+            mask ^= obs[self.boundary if b >= k else fired[b]]
+        return mask
+
+    def _shortest_paths(self, src: int) -> tuple[dict, dict]:
+        # Returns the distance and the observable mask of the shortest path
+        # from src to each reachable node.
+        if src not in self._paths:
+            pred, dist = nx.dijkstra_predecessor_and_distance(self.graph, src)
+            obs = {src: 0}
+            for v in sorted(dist, key=dist.get):
+                if v != src:
+                    u = pred[v][0]
+                    obs[v] = obs[u] ^ self.graph.edges[u, v]['obs']
+            self._paths[src] = (dist, obs)
+        return self._paths[src]
+
+class PymatchingDecoder:
+    """
+        Sparse blossom matching from pymatching.
+    """
+    decompose_errors = True
+
+    def __init__(self, dem: 'stim.DetectorErrorModel'):
+        import pymatching
+        self.matching = pymatching.Matching.from_detector_error_model(dem)
+
+    def decode_batch(self, detectors: np.ndarray) -> np.ndarray:
+        return self.matching.decode_batch(detectors, bit_packed_shots=True, bit_packed_predictions=True)
+
+DECODERS = {
+    'mwpm': MwpmDecoder,
+    'pymatching': PymatchingDecoder,
+    'restriction': RestrictionDecoder
+}
+
+def register_decoder(name: str, decoder) -> None:
+    """
+        Adds a decoder (see the module description). The decoder must be
+        picklable, as it is sent to the worker processes.
+    """
+    DECODERS[name] = decoder
+
+def estimate_logical_error_rate(circuit: 'stim.Circuit',
+                                decoder='auto',
+                                dem: 'stim.DetectorErrorModel' = None,
+                                max_shots: int = 1_000_000,
+                                batch_size: int = 10_000,
+                                target_rse: float = None,
+                                max_failures: int = None,
+                                processes: int = None,
+                                seed: int = None) -> dict:
+    """
+        Estimates the probability that the decoder mispredicts some
+        observable of the circuit (e.g. from QesManager.stim_circuit).
+        decoder is a name in DECODERS, 'auto' (pymatching if installed, else
+        the reference decoder), or a decoder itself. The DEM is computed from
+        the circuit unless given.
+
+        Shots are sampled in batches of batch_size on processes workers
+        (default: all cores; 1 runs in this process). Sampling stops after
+        max_shots shots, after max_failures failures, or once the relative
+        standard error of the estimate is at most target_rse. Batches that
+        are running when sampling stops are still counted.
+
+        If seed is set, each batch is sampled with its own seed, spawned from
+        seed (np.random.SeedSequence) in batch order. The estimate then only
+        depends on seed and the batches sampled, not on the number of
+        processes or which worker ran a batch.
+
+        Returns a dict with the shots, failures, logical error rate ('ler'),
+        its relative standard error ('rse'), the wall-clock time in seconds
+        and the throughput in shots per second. Raises a ValueError if the
+        circuit has no observables, as no shot could fail.
+    """
+    if circuit.num_observables == 0:
+        raise ValueError('circuit has no observables')
+    name, factory = _get_decoder(decoder)
+    if dem is None:
+        dem = circuit.detector_error_model(decompose_errors=getattr(factory, 'decompose_errors', True))
+    if processes is None:
+        processes = os.cpu_count()
+    initargs = (str(circuit), str(dem), factory)
+    seeds = _batch_seeds(seed)
+
+    shots, failures = 0, 0
+    t = time.perf_counter()
+    if processes == 1:
+        _init_worker(*initargs)
+        while shots < max_shots and not _done(shots, failures, target_rse, max_failures):
+            s, f = _run_batch(min(batch_size, max_shots - shots), next(seeds))
+            shots, failures = shots + s, failures + f
+    else:
+        with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=initargs) as executor:
+            running = set()
+            submitted = 0
+            while True:
+                # Keep every worker busy, with one batch queued behind it.
+                while len(running) < 2*processes and submitted < max_shots:
+                    n = min(batch_size, max_shots - submitted)
+                    running.add(executor.submit(_run_batch, n, next(seeds)))
+                    submitted += n
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    s, f = future.result()
+                    shots, failures = shots + s, failures + f
+                if len(running) == 0 or _done(shots, failures, target_rse, max_failures):
+                    break
+            for future in running:
+                if not future.cancel():
+                    s, f = future.result()
+                    shots, failures = shots + s, failures + f
+    seconds = time.perf_counter() - t
+    return {
+        'decoder': name,
+        'shots': shots,
+        'failures': failures,
+        'ler': failures / max(shots, 1),
+        'rse': _relative_error(shots, failures),
+        'seconds': seconds,
+        'shots_per_second': shots / max(seconds, 1e-12)
+    }
+
+def estimate_memory_experiment(tanner_graph: nx.Graph,
+                                rounds: int,
+                                noise: NoiseModel,
+                                memory: str = 'z',
+                                flag_min_weight: int = None,
+                                decoder='auto',
+                                cache_dir: str = None,
+                                cache_max_bytes: int = DEFAULT_MAX_BYTES,
+                                **kwargs) -> dict:
+    """
+        Runs estimate_logical_error_rate on the memory experiment of the
+        Tanner graph (see get_detector_error_model for the arguments). The
+        DEM is cached in cache_dir, if set. Other keyword arguments are
+        passed to estimate_logical_error_rate.
+    """
+    _, factory = _get_decoder(decoder)
+    if flag_min_weight is not None:
+        # Flags go on a copy; the DEM below then uses them as they are.
+        tanner_graph = tanner_graph.copy()
+    mgr = QesManager(tanner_graph)
+    mgr.memory = memory
+    mgr.noise = noise
+    if flag_min_weight is not None:
+        mgr.assign_flags(flag_min_weight)
+    dem = get_detector_error_model(tanner_graph, rounds, noise, memory, None,
+                                    getattr(factory, 'decompose_errors', True), cache_dir, cache_max_bytes)
+    return estimate_logical_error_rate(mgr.stim_circuit(rounds), decoder, dem, **kwargs)
+
+# State of a worker process: its circuit, unseeded sampler and decoder.
+_worker = {}
+
+def _init_worker(circuit_text: str, dem_text: str, factory) -> None:
+    import stim
+    _worker['circuit'] = stim.Circuit(circuit_text)
+    _worker['sampler'] = _worker['circuit'].compile_detector_sampler()
+    _worker['decoder'] = factory(stim.DetectorErrorModel(dem_text))
+
+def _batch_seeds(seed: int):
+    # Yields the seed of each batch (None if seed is None). Spawning one
+    # child at a time gives the same children as SeedSequence.spawn(n).
+    if seed is None:
+        while True:
+            yield None
+    seq = np.random.SeedSequence(seed)
+    while True:
+        yield int(seq.spawn(1)[0].generate_state(1, np.uint64)[0])
+
+def _run_batch(shots: int, seed: int = None) -> tuple[int, int]:
+    sampler = _worker['sampler']
+    if seed is not None:
+        sampler = _worker['circuit'].compile_detector_sampler(seed=seed)
+    detectors, observables = sampler.sample(shots, separate_observables=True, bit_packed=True)
+    predictions = _worker['decoder'].decode_batch(detectors)
+    return shots, int(np.count_nonzero(np.any(predictions != observables, axis=1)))
+
+def _get_decoder(decoder) -> tuple[str, object]:
+    if not isinstance(decoder, str):
+        return getattr(decoder, '__name__', type(decoder).__name__), decoder
+    if decoder == 'auto':
+        decoder = 'pymatching' if importlib.util.find_spec('pymatching') is not None else 'mwpm'
+    if decoder not in DECODERS:
+        raise ValueError('unknown decoder: %s' % decoder)
+    return decoder, DECODERS[decoder]
+
+def _relative_error(shots: int, failures: int) -> float:
+    # Standard error of failures/shots, relative to the estimate.
+    if failures == 0:
+        return math.inf
+    return math.sqrt((1 - failures/shots) / failures)
+
+def _done(shots: int, failures: int, target_rse: float, max_failures: int) -> bool:
+    if max_failures is not None and failures >= max_failures:
+        return True
+    return target_rse is not None and _relative_error(shots, failures) <= target_rse
+
+def _graphlike_errors(dem: 'stim.DetectorErrorModel', boundary: int):
+    # Yields (u, v, p, observable mask) for each graphlike component of each
+    # error in the DEM, where v is the boundary for single-detector components.
+    for inst in dem.flattened():
+        if inst.type != 'error':
+            continue
+        p = inst.args_copy()[0]
+        if p == 0:
+            continue
+        dets, mask = [], 0
+        for t in inst.targets_copy() + [None]:
+            if t is None or t.is_separator():
+                if len(dets) > 2:
+                    raise ValueError('error with %d detectors; the DEM must be decomposed' % len(dets))
+                if len(dets) > 0:
+                    yield (dets[0], dets[1] if len(dets) == 2 else boundary, p, mask)
+                dets, mask = [], 0
+            elif t.is_relative_detector_id():
+                dets.append(t.val)
+            elif t.is_logical_observable_id():
+                mask ^= 1 << t.val
+
+def _error_weight(p: float) -> float:
+    # Probabilities at or above 1/2 get a tiny positive weight.
+    return max(math.log((1-p)/p), 1e-9)
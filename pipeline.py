@@ -0,0 +1,191 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Batch pipeline over a code family: for each set of parameters, build the
+    code, schedule it, write the code and its memory experiment, and check
+    its distance. Codes are processed in a process pool, and each result is
+    appended to a JSONL manifest as soon as it finishes, so an interrupted
+    sweep resumes where it stopped.
+"""
+
+from qonstruct.code_builder.surface_code import make_rotated
+from qonstruct.code_builder.color_code import make_hexagonal
+from qonstruct.scheduling import *
+from qonstruct.distance import compute_code_distances, estimate_distance
+from qonstruct.io import write_tanner_graph_file
+from qonstruct.qes.manager import QesManager
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import json
+import os
+import time
+
+# Code families by name. Each builder takes the parameters as keyword
+# arguments and returns a Tanner graph.
+CODE_FAMILIES = {
+    'rotated': make_rotated,
+    'hexagonal': make_hexagonal
+}
+
+MANIFEST_FILE = 'manifest.jsonl'
+
+def register_code_family(name: str, builder) -> None:
+    """
+        Adds a code family. The builder must be importable by the worker
+        processes (i.e. a module-level function registered at import time).
+    """
+    CODE_FAMILIES[name] = builder
+
+def run_pipeline(family: str,
+                params: list,
+                output_dir: str,
+                processes: int = None,
+                rounds: int = None,
+                schedule='auto',
+                schedule_backend='auto',
+                cache_dir: str = None,
+                distance='exact',
+                distance_trials: int = 100) -> list[dict]:
+    """
+        Runs the pipeline on each entry of params, which is a dict of keyword
+        arguments for the family's builder (or a number, which is taken as
+        the distance d). Per code, this:
+            (1) builds the code,
+            (2) schedules it with compute_syndrome_extraction_schedule if
+                schedule is True, or if schedule is 'auto' and some check
+                has no schedule yet (schedule_backend and cache_dir are
+                passed through),
+            (3) writes the code (with its metadata) to <name>.txt and a
+                memory experiment with the given number of rounds (default:
+                d) to <name>.qes, in output_dir,
+            (4) computes the distance with compute_code_distances if distance
+                is 'exact', or with estimate_distance (distance_trials
+                trials) if it is 'estimate'; None skips this step.
+
+        Codes run in parallel on processes workers (default: all cores).
+        Each result is a dict that is appended to output_dir/manifest.jsonl
+        when it finishes. Parameters that already have a successful entry in
+        the manifest are not run again. Returns the results for params, in
+        order.
+    """
+    if family not in CODE_FAMILIES:
+        raise ValueError('unknown code family: %s' % family)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = os.path.join(output_dir, MANIFEST_FILE)
+    params = [p if isinstance(p, dict) else {'d': p} for p in params]
+
+    done = _read_manifest(manifest)
+    results = {}
+    pending = []
+    for p in params:
+        key = _job_key(family, p)
+        if key in done:
+            results[key] = done[key]
+        elif key not in results:
+            results[key] = None
+            pending.append(p)
+
+    if len(pending) > 0:
+        options = {
+            'rounds': rounds,
+            'schedule': schedule,
+            'schedule_backend': schedule_backend,
+            'cache_dir': cache_dir,
+            'distance': distance,
+            'distance_trials': distance_trials
+        }
+        jobs = [(family, p, output_dir, options) for p in pending]
+        writer = _open_manifest(manifest)
+        try:
+            with ProcessPoolExecutor(processes) as executor:
+                futures = [executor.submit(_run_job, j) for j in jobs]
+                for f in as_completed(futures):
+                    record = f.result()
+                    writer.write(json.dumps(record) + '\n')
+                    writer.flush()
+                    results[_job_key(family, record['params'])] = record
+        finally:
+            writer.close()
+    return [results[_job_key(family, p)] for p in params]
+
+def _job_key(family: str, params: dict) -> str:
+    return json.dumps([family, params], sort_keys=True)
+
+def _job_name(family: str, params: dict) -> str:
+    return '_'.join([family] + ['%s%s' % (k, params[k]) for k in sorted(params)])
+
+def _read_manifest(manifest: str) -> dict:
+    """
+        Returns the successful records of the manifest, by job key. Lines
+        that cannot be parsed (e.g. cut off by an interruption) are skipped.
+    """
+    done = {}
+    if not os.path.exists(manifest):
+        return done
+    with open(manifest, 'r') as reader:
+        for ln in reader:
+            try:
+                record = json.loads(ln)
+            except json.JSONDecodeError:
+                continue
+            if record.get('status') == 'ok':
+                done[_job_key(record['family'], record['params'])] = record
+    return done
+
+def _open_manifest(manifest: str):
+    # Opens the manifest for appending. If the last line was cut off, it is
+    # terminated so that it does not swallow the next record.
+    writer = open(manifest, 'a')
+    if writer.tell() > 0:
+        with open(manifest, 'rb') as reader:
+            reader.seek(-1, os.SEEK_END)
+            if reader.read(1) != b'\n':
+                writer.write('\n')
+    return writer
+
+def _run_job(args: tuple) -> dict:
+    family, params, output_dir, options = args
+    record = {'family': family, 'params': params, 'status': 'ok', 'times': {}}
+    times = record['times']
+    try:
+        t = time.perf_counter()
+        gr = CODE_FAMILIES[family](**params)
+        times['build'] = time.perf_counter() - t
+        record['n_data'] = len(gr.graph['data_qubits'])
+        record['n_checks'] = len(gr.graph['checks']['all'])
+
+        schedule = options['schedule']
+        if schedule == 'auto':
+            schedule = any(len(gr.nodes[ch]['schedule_order']) == 0 for ch in gr.graph['checks']['all'])
+        if schedule:
+            t = time.perf_counter()
+            compute_syndrome_extraction_schedule(gr, backend=options['schedule_backend'], cache_dir=options['cache_dir'])
+            times['schedule'] = time.perf_counter() - t
+
+        name = _job_name(family, params)
+        t = time.perf_counter()
+        record['code_file'] = os.path.join(output_dir, name + '.txt')
+        write_tanner_graph_file(gr, record['code_file'])
+        rounds = options['rounds'] if options['rounds'] is not None else params.get('d', 1)
+        record['circuit_file'] = os.path.join(output_dir, name + '.qes')
+        mgr = QesManager(gr)
+        mgr.fopen(record['circuit_file'])
+        mgr.write_memory_experiment(rounds)
+        mgr.fclose()
+        times['emit'] = time.perf_counter() - t
+
+        if options['distance'] is not None:
+            t = time.perf_counter()
+            if options['distance'] == 'exact':
+                distances = compute_code_distances(gr, processes=1)
+                record['distance'] = {s: d for (s, (d, _)) in distances.items()}
+            else:
+                record['distance'] = {s: estimate_distance(gr, s == 'x', trials=options['distance_trials'])[0]
+                                        for s in ['x', 'z']}
+            times['distance'] = time.perf_counter() - t
+    except Exception as e:
+        record['status'] = 'error'
+        record['error'] = '%s: %s' % (type(e).__name__, str(e))
+    return record
@@ -0,0 +1,302 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Output backends for QesManager.
+"""
+
+import io
+
+class TextEmitter:
+    """
+        Writes the QES text format. Lines are buffered and written to the
+        sink in chunks of at least chunk_size characters. The sink is either
+        a file-like object (anything with a write method) or a generator,
+        which is primed and then sent each chunk.
+
+        Repetition is written as a block:
+            repeat <N> {
+                ...
+            }
+        whose body runs N times. Inside a repeat block, the operands of
+        events are relative: the event index is counted from the first event
+        of the current iteration, and measurement indices are negative,
+        counting back from the most recent measurement (-1).
+    """
+    supports_repeat = True
+
+    def __init__(self, sink, chunk_size: int = 1 << 16, close_sink=False):
+        self.sink = sink
+        self.chunk_size = chunk_size
+        self.close_sink = close_sink
+
+        if hasattr(sink, 'write'):
+            self._send = sink.write
+        else:
+            next(sink)
+            self._send = sink.send
+        self._buf = []
+        self._buf_len = 0
+        # Saved buffers of the enclosing fragments and repeat blocks.
+        self._saved = []
+        self._repeat_depth = 0
+
+    def write(self, text: str):
+        self._buf.append(text)
+        self._buf_len += len(text)
+        if self._buf_len >= self.chunk_size and len(self._saved) == 0:
+            self.flush()
+
+    def op(self, opname: str, operands: list[int]):
+        self.write('%s %s;\n' % (opname, ','.join(map(str, operands))))
+
+    def noise(self, channel: str, p: float, operands: list[int]):
+        """
+            Writes an error channel ('x_error', 'depolarize1' or 'depolarize2')
+            with probability p as the operation '<channel>(<p>)'.
+        """
+        self.write('%s(%s) %s;\n' % (channel, str(p), ','.join(map(str, operands))))
+
+    def annotation(self, name: str):
+        self.write('@annotation %s\n' % name)
+
+    def property(self, name: str, value: int|float):
+        self.write('@property %s %s\n' % (name, str(value)))
+
+    def comment(self, text: str):
+        self.write('# %s\n' % text)
+
+    def big_comment(self, text: str):
+        self.write('#\n# %s \n#\n' % text)
+
+    def begin_fragment(self):
+        """
+            Starts recording output into a fragment instead of the sink.
+        """
+        self._saved.append((self._buf, self._buf_len))
+        self._buf, self._buf_len = [], 0
+
+    def end_fragment(self) -> str:
+        """
+            Stops recording and returns the fragment, which can be written
+            any number of times with fragment().
+        """
+        text = ''.join(self._buf)
+        self._buf, self._buf_len = self._saved.pop()
+        return text
+
+    def fragment(self, text: str):
+        self.write(text)
+
+    def compile_events(self, events: list[tuple], n_meas: int) -> tuple:
+        """
+            Compiles the detection events of a round with n_meas measurements.
+            Each event is a tuple (properties, annotation, first_round_meas,
+            meas), where the measurements are relative to the start of the
+            round. Returns a format string and the measurement offsets for the
+            first round and for later rounds, and n_meas.
+        """
+        compiled = []
+        for first in [True, False]:
+            parts, meas = [], []
+            for (props, annotation, first_offsets, offsets) in events:
+                for (name, value) in props:
+                    parts.append(('@property %s %s\n' % (name, str(value))).replace('%', '%%'))
+                if annotation is not None:
+                    parts.append(('@annotation %s\n' % annotation).replace('%', '%%'))
+                offsets = first_offsets if first else offsets
+                parts.append('event %d' + ',%d'*len(offsets) + ';\n')
+                meas.append(offsets)
+            compiled.append((''.join(parts), meas))
+        compiled.append(n_meas)
+        return tuple(compiled)
+
+    def write_events(self, compiled: tuple, first_round: bool, ectr: int, meas_start: int):
+        """
+            Writes compiled events, numbered from ectr, for a round whose first
+            measurement is meas_start.
+        """
+        fmt, meas = compiled[0] if first_round else compiled[1]
+        values = []
+        if self._repeat_depth > 0:
+            # Relative operands (the events follow the round's measurements).
+            n_meas = compiled[2]
+            for (i, offsets) in enumerate(meas):
+                values.append(i)
+                values.extend(m-n_meas for m in offsets)
+        else:
+            for (i, offsets) in enumerate(meas):
+                values.append(ectr+i)
+                values.extend(meas_start+m for m in offsets)
+        self.write(fmt % tuple(values))
+
+    def begin_repeat(self):
+        """
+            Starts the body of a repeat block.
+        """
+        self.begin_fragment()
+        self._repeat_depth += 1
+
+    def end_repeat(self, repetitions: int):
+        """
+            Ends the body of a repeat block, which runs repetitions times.
+        """
+        self._repeat_depth -= 1
+        body = self.end_fragment()
+        self.write('repeat %d {\n%s}\n' % (repetitions, body))
+
+    def flush(self):
+        if self._buf_len == 0:
+            return
+        self._send(''.join(self._buf))
+        self._buf.clear()
+        self._buf_len = 0
+
+    def close(self):
+        self.flush()
+        if self.close_sink:
+            self.sink.close()
+
+def open_sink(filename: str, compression: str = 'auto'):
+    """
+        Opens filename for writing text, optionally through a streaming
+        compressor: compression is None, 'gzip', 'zstd' (needs the zstandard
+        package) or 'auto', which picks by extension (.gz or .zst).
+    """
+    if compression == 'auto':
+        if filename.endswith('.gz'):
+            compression = 'gzip'
+        elif filename.endswith('.zst'):
+            compression = 'zstd'
+        else:
+            compression = None
+    if compression is None:
+        return open(filename, 'w')
+    if compression == 'gzip':
+        import gzip
+        return gzip.open(filename, 'wt')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError('zstd compression requires the zstandard package')
+        writer = zstandard.ZstdCompressor().stream_writer(open(filename, 'wb'), closefd=True)
+        return io.TextIOWrapper(writer, encoding='utf-8')
+    raise ValueError('unknown compression: %s' % compression)
+
+STIM_GATES = {
+    'h': 'H',
+    'cx': 'CX',
+    'measure': 'M',
+    'reset': 'R',
+    'x_error': 'X_ERROR',
+    'depolarize1': 'DEPOLARIZE1',
+    'depolarize2': 'DEPOLARIZE2'
+}
+
+class StimEmitter:
+    """
+        Builds a stim.Circuit in memory. Events become DETECTORs and
+        observables become OBSERVABLE_INCLUDEs, with measurements converted to
+        rec targets. Detector coordinates are (base, color, t): base and color
+        come from the properties written before the event (-1 if missing,
+        e.g. for flag events), and t counts the rounds started so far (each
+        'timing_error' annotation shifts it by one). Comments are dropped.
+    """
+    supports_repeat = True
+
+    def __init__(self):
+        import stim
+        self._stim = stim
+        self.circuit = stim.Circuit()
+        self._n_meas = 0
+        self._props = {}
+        # Saved (circuit, measurement count) of enclosing fragments/repeat blocks.
+        self._stack = []
+
+    def op(self, opname: str, operands: list[int]):
+        if opname == 'event':
+            self._detector(operands[1:])
+        elif opname == 'obs':
+            targets = [self._stim.target_rec(m - self._n_meas) for m in operands[1:]]
+            self.circuit.append('OBSERVABLE_INCLUDE', targets, operands[0])
+        else:
+            self.circuit.append(STIM_GATES[opname], operands)
+            if opname == 'measure':
+                self._n_meas += len(operands)
+
+    def noise(self, channel: str, p: float, operands: list[int]):
+        self.circuit.append(STIM_GATES[channel], operands, p)
+
+    def _detector(self, meas: list[int]):
+        coords = [self._props.get('base', -1), self._props.get('color', -1), 0]
+        self.circuit.append('DETECTOR', [self._stim.target_rec(m - self._n_meas) for m in meas], coords)
+        self._props.clear()
+
+    def annotation(self, name: str):
+        if name == 'timing_error':
+            self.circuit.append('SHIFT_COORDS', [], [0, 0, 1])
+
+    def property(self, name: str, value: int|float):
+        self._props[name] = value
+
+    def comment(self, text: str):
+        pass
+
+    def big_comment(self, text: str):
+        pass
+
+    def begin_fragment(self):
+        self._stack.append((self.circuit, self._n_meas))
+        self.circuit = self._stim.Circuit()
+
+    def end_fragment(self) -> 'stim.Circuit':
+        fragment = self.circuit
+        self.circuit, self._n_meas = self._stack.pop()
+        return fragment
+
+    def fragment(self, fragment: 'stim.Circuit'):
+        self.circuit += fragment
+        self._n_meas += fragment.num_measurements
+
+    def compile_events(self, events: list[tuple], n_meas: int) -> tuple:
+        """
+            Same as TextEmitter.compile_events. Since the events are written
+            right after the round's measurements, their rec targets do not
+            depend on the round, so each case compiles to a fixed circuit.
+        """
+        compiled = []
+        for first in [True, False]:
+            c = self._stim.Circuit()
+            for (props, _, first_offsets, offsets) in events:
+                props = dict(props)
+                coords = [props.get('base', -1), props.get('color', -1), 0]
+                offsets = first_offsets if first else offsets
+                c.append('DETECTOR', [self._stim.target_rec(m - n_meas) for m in offsets], coords)
+            compiled.append(c)
+        return tuple(compiled)
+
+    def write_events(self, compiled: tuple, first_round: bool, ectr: int, meas_start: int):
+        self.circuit += compiled[0] if first_round else compiled[1]
+
+    def begin_repeat(self):
+        """
+            Starts the body of a repeat block.
+        """
+        self._stack.append((self.circuit, self._n_meas))
+        self.circuit = self._stim.Circuit()
+
+    def end_repeat(self, repetitions: int):
+        """
+            Ends the body of a repeat block, which runs repetitions times.
+        """
+        body = self.circuit
+        self.circuit, start = self._stack.pop()
+        self.circuit.append(self._stim.CircuitRepeatBlock(repetitions, body))
+        self._n_meas = start + body.num_measurements*repetitions
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
@@ -3,7 +3,12 @@
     date:   1 December 2023
 """
 
+from qonstruct.qes.emitter import *
+from qonstruct.qes.noise import *
+from qonstruct.code_builder import base
+
 import networkx as nx
+import numpy as np
 
 from collections import defaultdict
 
@@ -17,6 +22,9 @@ class QesManager:
 
         # Public parameters:
         self.memory = 'z'
+        self.skip_comments = False
+        self.use_repeat = True  # Write rounds 2 and up as one repeat block, if the emitter can.
+        self.noise = None   # A NoiseModel, applied while emitting the circuit.
 
         # Simulation structures
         self.meas_ctr_map = {'curr': 0}
@@ -29,11 +37,23 @@ class QesManager:
         #       used in the syndrome extraction of x.
         self.flag_qubits = []
         self.flag_assignment_map = {}
+        # Flag gates by depth, built on first use (see _flag_layers).
+        self._flag_layer_cache = None
+
+        # All qubits (data, parity and flag), for idle errors.
+        self._all_qubits = list(tanner_graph.nodes())
+
+        # Flags stored in the graph (see code_builder.base.add_flags_to).
+        for ch in tanner_graph.graph['checks']['all']:
+            for (q1, q2) in tanner_graph.nodes[ch].get('flags', []):
+                self.add_flags_to(q1, q2, ch)
 
     def add_flags_to(self, q1: int, q2: int, check: int) -> int:
         """
             Adds flags to qubits q1 and q2 during the measurement of the specified check.
-            Returns the flag qubit id.
+            The CNOTs of q1 and q2 go to the flag qubit instead of the parity qubit,
+            and the flag is entangled with the parity qubit before the data CNOTs
+            and disentangled after them. Returns the flag qubit id.
         """
         if check not in self.flag_assignment_map:
             self.flag_assignment_map[check] = {'all': []}
@@ -42,13 +62,72 @@ class QesManager:
         self.flag_assignment_map[check][q1] = self.n
         self.flag_assignment_map[check][q2] = self.n
         self.flag_qubits.append(self.n)
+        self._all_qubits.append(self.n)
+        self._flag_layer_cache = None
         self.n += 1
+        return self.n - 1
+
+    def assign_flags(self, min_weight: int = 6) -> int:
+        """
+            Adds one flag to every check of weight at least min_weight that
+            has no flags yet, on the two middle data qubits of its schedule
+            (skipping None). The flags are also recorded in the Tanner graph
+            (code_builder.base.add_flags_to), so they are written with it.
+
+            A flag's CNOTs with the parity qubit bracket all data CNOTs of the
+            check, so one flag is flipped by a fault on the parity qubit
+            anywhere between the first and last data CNOT, which covers every
+            hook error. More flags would be flipped by the same faults and do
+            not tell hook errors apart. Returns the number of flags added.
+        """
+        checks = [ch for ch in self.code.graph['checks']['all'] if ch not in self.flag_assignment_map]
+        if len(checks) == 0:
+            return 0
+        orders = [self.code.nodes[ch]['schedule_order'] for ch in checks]
+        width = max(len(order) for order in orders)
+        # Schedules as a matrix (-1 for None or padding), with the data
+        # qubits of each row moved to the front in schedule order.
+        sched = np.full((len(checks), width), -1, dtype=np.int64)
+        for (i, order) in enumerate(orders):
+            sched[i, :len(order)] = [-1 if q is None else q for q in order]
+        sched = np.take_along_axis(sched, np.argsort(sched < 0, axis=1, kind='stable'), axis=1)
+        weights = np.count_nonzero(sched >= 0, axis=1)
+
+        rows = np.flatnonzero(weights >= max(min_weight, 2))
+        cols = weights[rows]//2 - 1
+        for (i, q1, q2) in zip(rows.tolist(), sched[rows, cols].tolist(), sched[rows, cols+1].tolist()):
+            base.add_flags_to(self.code, q1, q2, checks[i])
+            self.add_flags_to(q1, q2, checks[i])
+        return len(rows)
+
+    def fopen(self, filename: str, compression: str = 'auto'):
+        """
+            Writes output to filename. Output is compressed on the fly if
+            compression is 'gzip' or 'zstd', or if it is 'auto' and the
+            file name ends with .gz or .zst (see open_sink).
+        """
+        self.attach(open_sink(filename, compression), close_sink=True)
 
-    def fopen(self, filename: str):
-        self._writer = open(filename, 'w')
+    def attach(self, sink, close_sink=False):
+        """
+            Writes output to sink, which is a file-like object or a generator
+            that receives chunks of text (see TextEmitter).
+        """
+        self._emitter = TextEmitter(sink, close_sink=close_sink)
 
     def fclose(self):
-        self._writer.close()
+        self._emitter.close()
+
+    def stim_circuit(self, rounds: int) -> 'stim.Circuit':
+        """
+            Builds the memory experiment as a stim.Circuit (see StimEmitter),
+            without going through the text format.
+        """
+        self.meas_ctr_map = {'curr': 0}
+        self.event_ctr, self.obs_ctr = 0, 0
+        self._emitter = StimEmitter()
+        self.write_memory_experiment(rounds)
+        return self._emitter.circuit
 
     def write_memory_experiment(self, rounds: int):
         data_qubits = self.code.graph['data_qubits']
@@ -71,31 +150,24 @@ class QesManager:
         #
         self.big_comment('BODY')
         n_meas_per_round = len(mem_checks) + len(mem_flags)
+        # Every round emits the same gates and events; only the measurement
+        # and event indices change. So the round is compiled once.
+        template = self._compile_round(mem_checks, mem_flags, rounds)
         ectr = 0
-        for r in range(rounds):
-            prev_meas_ctr_map = self.meas_ctr_map.copy()
-            self.annotation('timing_error')
-            self._standard_syndrome_extraction()
-            # Create detection events.
-            for pq in mem_checks:
-                if 'color' in self.code.nodes[pq]:
-                    self.property('color', self.code.nodes[pq]['color'])
-                base_ectr = ectr % n_meas_per_round
-                if rounds > 1:
-                    base_ectr += n_meas_per_round
-                self.property('base', base_ectr)
-                if r == 0:
-                    m = self.meas_ctr_map[pq]
-                    self.event(ectr, m)
-                else:
-                    m1, m2 = self.meas_ctr_map[pq], prev_meas_ctr_map[pq]
-                    self.event(ectr, m1, m2)
-                ectr += 1
-            for fq in mem_flags:
-                m = self.meas_ctr_map[fq]
-                self.annotation('flag')
-                self.event(ectr, m)
-                ectr += 1
+        if self.use_repeat and self._emitter.supports_repeat and rounds > 2:
+            # All rounds after the first are identical up to the measurement
+            # and event indices, so the emitter can repeat a single round.
+            ectr = self._write_round(template, 0, ectr)
+            self._emitter.begin_repeat()
+            ectr = self._write_round(template, 1, ectr)
+            self._emitter.end_repeat(rounds-1)
+            self.meas_ctr_map['curr'] += template['n_meas']*(rounds-2)
+            ectr += template['n_events']*(rounds-2)
+        else:
+            for r in range(rounds):
+                ectr = self._write_round(template, r, ectr)
+        if rounds > 0:
+            self._end_rounds(template)
         #
         # EPILOGUE
         #
@@ -122,6 +194,66 @@ class QesManager:
             meas_array = [self.meas_ctr_map[x] for x in obs]
             self.auto_obs(*meas_array)
 
+    def _compile_round(self, mem_checks: list[int], mem_flags: list[int], rounds: int) -> dict:
+        """
+            Compiles one round of syndrome extraction into a template:
+                'gates':    the emitted gates (an emitter fragment),
+                'n_meas':   the number of measurements in the round,
+                'offsets':  the measurement index of each measured qubit,
+                            relative to the start of the round,
+                'events':   the detection events of the round, compiled by
+                            the emitter (see TextEmitter.compile_events).
+        """
+        start = self.meas_ctr_map['curr']
+        self._emitter.begin_fragment()
+        self.annotation('timing_error')
+        self._standard_syndrome_extraction()
+        gates = self._emitter.end_fragment()
+        n_meas = self.meas_ctr_map['curr'] - start
+        offsets = {x: self.meas_ctr_map[x] - start for x in [*self.flag_qubits, *self.code.graph['checks']['all']]}
+        self.meas_ctr_map['curr'] = start
+
+        # Each event is (properties, annotation, measurements in the first
+        # round, measurements in later rounds), with measurements relative to
+        # the start of the round.
+        n_events = len(mem_checks) + len(mem_flags)
+        events = []
+        for (i, pq) in enumerate(mem_checks):
+            props = []
+            if 'color' in self.code.nodes[pq]:
+                props.append(('color', self.code.nodes[pq]['color']))
+            props.append(('base', i + n_events if rounds > 1 else i))
+            m = offsets[pq]
+            events.append((props, None, [m], [m, m - n_meas]))
+        for fq in mem_flags:
+            m = offsets[fq]
+            events.append(([], 'flag', [m], [m]))
+        return {
+            'gates': gates,
+            'n_meas': n_meas,
+            'offsets': offsets,
+            'n_events': n_events,
+            'events': self._emitter.compile_events(events, n_meas)
+        }
+
+    def _write_round(self, template: dict, r: int, ectr: int) -> int:
+        """
+            Writes round r from the template; ectr is the index of the first
+            event of the round. Returns the index of the next event.
+            meas_ctr_map is only updated for 'curr' (see _end_rounds).
+        """
+        start = self.meas_ctr_map['curr']
+        self._emitter.fragment(template['gates'])
+        self.meas_ctr_map['curr'] = start + template['n_meas']
+        self._emitter.write_events(template['events'], r == 0, ectr, start)
+        return ectr + template['n_events']
+
+    def _end_rounds(self, template: dict):
+        # Points meas_ctr_map to the measurements of the last round.
+        start = self.meas_ctr_map['curr'] - template['n_meas']
+        for (x, offset) in template['offsets'].items():
+            self.meas_ctr_map[x] = start + offset
+
     def h(self, operands: list[int]):
         self._op('h', operands)
 
@@ -156,19 +288,40 @@ class QesManager:
     def _op(self, opname: str, operands: list[int]):
         if len(operands) == 0:
             return
-        self._writer.write('%s %s;\n' % (opname, concat(operands)))
+        noise = self.noise
+        if noise is None or opname in ['event', 'obs']:
+            self._emitter.op(opname, operands)
+            return
+        if opname == 'measure' and noise.p_meas > 0:
+            self._emitter.noise('x_error', noise.p_meas, operands)
+        self._emitter.op(opname, operands)
+        if opname == 'reset' and noise.p_reset > 0:
+            self._emitter.noise('x_error', noise.p_reset, operands)
+        if opname == 'h' and noise.p_gate1 > 0:
+            self._emitter.noise('depolarize1', noise.p_gate1, operands)
+        if opname == 'cx' and noise.p_gate2 > 0:
+            self._emitter.noise('depolarize2', noise.p_gate2, operands)
+        if opname in ['h', 'cx'] and noise.p_idle > 0:
+            active = set(operands)
+            idle = [q for q in self._all_qubits if q not in active]
+            if len(idle) > 0:
+                self._emitter.noise('depolarize1', noise.p_idle, idle)
 
     def annotation(self, name: str):
-        self._writer.write('@annotation %s\n' % name)
+        self._emitter.annotation(name)
+        if name == 'timing_error' and self.noise is not None and self.noise.p_timing > 0:
+            self._emitter.noise('depolarize1', self.noise.p_timing, self.code.graph['data_qubits'])
 
     def property(self, name: str, value: int|float):
-        self._writer.write('@property %s %s\n' % (name, str(value)))
+        self._emitter.property(name, value)
 
     def comment(self, text: str):
-        self._writer.write('# %s\n' % text)
+        if not self.skip_comments:
+            self._emitter.comment(text)
 
     def big_comment(self, text: str):
-        self._writer.write('#\n# %s \n#\n' % text)
+        if not self.skip_comments:
+            self._emitter.big_comment(text)
 
     def _standard_syndrome_extraction(self):
         checks = self.code.graph['checks']['all']
@@ -180,59 +333,53 @@ class QesManager:
         self.h(x_checks)
 
         self.comment('FLAG SETUP')
-        self._flag_hadamards(checks)
-        self._flag_cnots(checks)
+        self._flag_hadamards()
+        self._flag_cnots()
 
         self.comment('DATA CNOTS')
         self._data_cnots(checks)
 
         self.comment('FLAG TEARDOWN')
-        self._flag_cnots(checks)
-        self._flag_hadamards(checks)
+        self._flag_cnots()
+        self._flag_hadamards()
 
         self.h(x_checks)
         self.measure(self.flag_qubits)
         self.measure(checks)
 
-    def _flag_hadamards(self, checks: list[int]):
-        depth = 0
-        while True: 
-            h_list = []
-            for pq in checks:
+    def _flag_layers(self) -> list[tuple[list[int], list[int]]]:
+        """
+            Returns, for each depth, the flag qubits that get a Hadamard (flags
+            of Z checks) and the CNOT operands between flags and their checks.
+            Layer i contains the i-th flag of every check that has one.
+        """
+        if self._flag_layer_cache is None:
+            layers = []
+            for pq in self.code.graph['checks']['all']:
                 if pq not in self.flag_assignment_map:
                     continue
-                flag_list = self.flag_assignment_map[pq]['all']
-                if depth >= len(flag_list):
-                    continue
-                fq = flag_list[depth]
                 s = self.code.nodes[pq]['node_type']
-                if s == 'z':
-                    h_list.append(fq)
+                for (depth, fq) in enumerate(self.flag_assignment_map[pq]['all']):
+                    if depth == len(layers):
+                        layers.append(([], []))
+                    h_list, cx_list = layers[depth]
+                    if s == 'x':
+                        cx_list.extend([pq, fq])
+                    else:
+                        h_list.append(fq)
+                        cx_list.extend([fq, pq])
+            self._flag_layer_cache = layers
+        return self._flag_layer_cache
+
+    def _flag_hadamards(self):
+        for (h_list, _) in self._flag_layers():
             if len(h_list) == 0:
                 break
             self.h(h_list)
-            depth += 1
 
-    def _flag_cnots(self, checks: list[int]):
-        depth = 0
-        while True:
-            cx_list = []
-            for pq in checks:
-                if pq not in self.flag_assignment_map:
-                    continue
-                flag_list = self.flag_assignment_map[pq]['all']
-                if depth >= len(flag_list):
-                    continue
-                fq = flag_list[depth]
-                s = self.code.nodes[pq]['node_type']
-                if s == 'x':
-                    cx_list.extend([pq, fq])
-                else:
-                    cx_list.extend([fq, pq])
-            if len(cx_list) == 0:
-                break
+    def _flag_cnots(self):
+        for (_, cx_list) in self._flag_layers():
             self.cx(cx_list)
-            depth += 1
 
     def _data_cnots(self, checks: list[int]):
         depth = 0
@@ -0,0 +1,44 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+"""
+
+class NoiseModel:
+    """
+        Error rates that QesManager folds into the circuit as it is emitted:
+            p_gate1:    depolarizing error after each single-qubit gate (h),
+            p_gate2:    two-qubit depolarizing error after each cx,
+            p_meas:     bit flip before each measurement,
+            p_reset:    bit flip after each reset,
+            p_idle:     depolarizing error on every qubit that is idle during
+                        a layer of h or cx gates,
+            p_timing:   depolarizing error on the data qubits at the start of
+                        each round of syndrome extraction.
+        Rates that are 0 are not emitted.
+    """
+    def __init__(self,
+                    p_gate1: float = 0.0,
+                    p_gate2: float = 0.0,
+                    p_meas: float = 0.0,
+                    p_reset: float = 0.0,
+                    p_idle: float = 0.0,
+                    p_timing: float = 0.0):
+        self.p_gate1 = p_gate1
+        self.p_gate2 = p_gate2
+        self.p_meas = p_meas
+        self.p_reset = p_reset
+        self.p_idle = p_idle
+        self.p_timing = p_timing
+
+    @staticmethod
+    def uniform(p: float, idle=True, timing=False) -> 'NoiseModel':
+        """
+            Circuit-level noise where every operation fails with rate p.
+        """
+        return NoiseModel(p, p, p, p, p if idle else 0.0, p if timing else 0.0)
+
+    def params(self) -> tuple[float, ...]:
+        return (self.p_gate1, self.p_gate2, self.p_meas, self.p_reset, self.p_idle, self.p_timing)
+
+    def __repr__(self) -> str:
+        return 'NoiseModel(p_gate1=%g, p_gate2=%g, p_meas=%g, p_reset=%g, p_idle=%g, p_timing=%g)' % self.params()
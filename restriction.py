@@ -0,0 +1,440 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Restriction decoder for color codes (Kubica and Delfosse), on the
+    detector error model of a memory experiment. Detectors are colored by
+    their plaquette (the color coordinate written by QesManager), and each
+    boundary of the code is a virtual detector of the color it lacks. An
+    error with an odd number of detectors of some color (e.g. a data qubit
+    error) also touches the boundary of each color it has no detector of,
+    so it has one vertex of each color, as if the code were closed. An
+    error with two detectors of one color (e.g. a measurement error) is an
+    edge between them.
+
+    The boundaries are not measured, but their syndrome is fixed by the
+    parity of the number of odd errors: boundary c is fired if an odd
+    number of detectors of color c are fired, plus that parity. As the
+    stabilizers flip an even number of odd errors, the two parities give
+    corrections that differ by a logical operator. For each parity:
+        (1) for each pair of colors (RG, RB, GB), the fired vertices of
+            those colors are matched on the restricted lattice, i.e. the
+            graph of the errors' edges on those colors,
+        (2) for each color c, the matched edges around each vertex of
+            color c are lifted to a set of errors around it, and matched
+            edges between two vertices of another color are taken as they
+            are. The union of these errors is a correction,
+        (3) corrections whose syndrome is not the fired detectors (which can
+            happen near the boundaries) are dropped.
+    The lightest correction wins. Each matching weighs at most as much as
+    any correction with its parity, so if the lightest correction is not
+    lighter than the matchings of the other parity, a bounded search over
+    the errors (branch and bound, see _search) looks for a lighter one. With
+    this, every error of weight at most (d-1)/2 is corrected.
+
+    The restricted lattices and their shortest-path tables are built once,
+    and small matchings are found with a table of all matchings. Lifting is
+    a shortest-path problem on the errors around a vertex, whose tables
+    are built on first use.
+"""
+
+import networkx as nx
+import numpy as np
+
+from collections import defaultdict, OrderedDict
+
+import math
+
+# The node of a lifting graph that stands for "no local edge".
+_NONE = 'none'
+
+# Matchings of at most this many vertices are found by trying every
+# matching (see _matching_table) rather than with the blossom algorithm.
+MAX_ENUMERATED_MATCHING = 10
+
+# The number of partial corrections _search visits before giving up.
+MAX_SEARCH_NODES = 20_000
+
+# The number of decoded syndromes kept by each decoder.
+MAX_CACHED_SYNDROMES = 1 << 16
+
+# Tolerance when comparing sums of weights.
+_EPS = 1e-9
+
+class RestrictionDecoder:
+    """
+        Restriction decoder for the undecomposed DEM of a colored code (see
+        color_tanner_graph). Flag detectors, which have no color, are
+        ignored. Up to MAX_CACHED_SYNDROMES decoded syndromes are kept (the
+        least recently used ones are dropped), so repeated syndromes are
+        decoded once.
+    """
+    decompose_errors = False
+
+    def __init__(self, dem: 'stim.DetectorErrorModel'):
+        n = dem.num_detectors
+        self.n_detectors = n
+        self.n_observables = dem.num_observables
+        coords = dem.get_detector_coordinates()
+        self.colors = np.array([int(coords[i][1]) if len(coords.get(i, [])) > 1 else -1 for i in range(n)])
+        if np.any(self.colors > 2) or not np.any(self.colors >= 0):
+            raise ValueError('restriction decoder needs detectors colored 0, 1 or 2')
+        # Colors of the detectors followed by the boundaries.
+        self._vertex_colors = np.concatenate([self.colors, [0, 1, 2]])
+        errors = _restricted_errors(dem, self.colors)
+        self.lattices = {L: RestrictedLattice(n, L, errors) for L in [(0, 1), (0, 2), (1, 2)]}
+        # The detectors (as a bitset), observables and weight of each error,
+        # and the errors with each detector.
+        self._error_bits = [sum(1 << x for x in dets) for (_, _, dets, _) in errors]
+        self._error_obs = [obs for (_, obs, _, _) in errors]
+        self._error_weights = [_error_weight(p) for (p, _, _, _) in errors]
+        self._errors_at = defaultdict(list)
+        for (i, (_, _, dets, _)) in enumerate(errors):
+            for x in dets:
+                self._errors_at[x].append(i)
+        # For _search: the detectors of each color (as bitsets), and the
+        # most detectors of each color that one error has.
+        self._color_bits = [sum(1 << x for x in np.flatnonzero(self.colors == c).tolist()) for c in range(3)]
+        self._max_per_color = [max([bin(b & cb).count('1') for b in self._error_bits] + [1]) for cb in self._color_bits]
+        self._min_weight = min(self._error_weights, default=1.0)
+        # Errors around each vertex: (local edges, error), where the local
+        # edges are the (lattice, edge) pairs of the error that touch it.
+        # Edges between two vertices of one color are also kept with the
+        # lightest error that has them, since no lift of another color
+        # covers them.
+        self._generators = defaultdict(list)
+        self._direct = {}
+        for (i, (_, _, _, edges)) in enumerate(errors):
+            touched = defaultdict(list)
+            for (L, e) in edges:
+                for x in e:
+                    touched[x].append((L, e))
+                if self._vertex_colors[e[0]] == self._vertex_colors[e[1]]:
+                    j = self._direct.get((L, e))
+                    if j is None or self._error_weights[i] < self._error_weights[j]:
+                        self._direct[(L, e)] = i
+            for (x, local) in touched.items():
+                self._generators[x].append((local, i))
+        self._lift_graphs = {}
+        self._lift_paths = {}
+        self._predictions = OrderedDict()
+
+    def decode_batch(self, detectors: np.ndarray) -> np.ndarray:
+        """
+            Decodes bit-packed detection events (shots x ceil(detectors/8))
+            into bit-packed observable predictions.
+        """
+        out = np.zeros((detectors.shape[0], (self.n_observables+7)//8), dtype=np.uint8)
+        nonzero = np.flatnonzero(detectors.any(axis=1))
+        if len(nonzero) == 0:
+            return out
+        syndromes, inverse = np.unique(detectors[nonzero], axis=0, return_inverse=True)
+        predictions = np.zeros((len(syndromes), out.shape[1]), dtype=np.uint8)
+        fired = np.unpackbits(syndromes, axis=1, bitorder='little')[:, :self.n_detectors]
+        for (i, row) in enumerate(syndromes):
+            key = row.tobytes()
+            if key in self._predictions:
+                self._predictions.move_to_end(key)
+            else:
+                mask = self.decode(np.flatnonzero(fired[i]))
+                bits = [(mask >> k) & 1 for k in range(self.n_observables)]
+                self._predictions[key] = np.packbits(np.array(bits, dtype=np.uint8), bitorder='little')
+                if len(self._predictions) > MAX_CACHED_SYNDROMES:
+                    self._predictions.popitem(last=False)
+            predictions[i] = self._predictions[key]
+        out[nonzero] = predictions[inverse.reshape(-1)]
+        return out
+
+    def decode(self, fired: np.ndarray) -> int:
+        """
+            Returns the observables flipped by the correction of the fired
+            detectors, as a bitmask.
+        """
+        fired = fired[self.colors[fired] >= 0]
+        syndrome = sum(1 << x for x in fired.tolist())
+        counts = np.bincount(self.colors[fired], minlength=3)
+        # The lightest correction of each parity, as (weight, observables),
+        # and the heaviest matching of each parity.
+        best = [(math.inf, 0), (math.inf, 0)]
+        bounds = [0.0, 0.0]
+        for parity in (0, 1):
+            boundaries = [self.n_detectors + c for c in range(3) if (counts[c] + parity) % 2 == 1]
+            vertices = np.concatenate([fired, boundaries]).astype(np.int64)
+            on = self._vertex_colors[vertices]
+            matched = {}
+            for (L, lattice) in self.lattices.items():
+                matched[L], weight = lattice.match(vertices[np.isin(on, L)])
+                bounds[parity] = max(bounds[parity], weight)
+            for c in range(3):
+                correction = self._lift_color(c, matched)
+                if correction is None:
+                    continue
+                bits, weight, mask = self._evaluate(correction)
+                if bits == syndrome and weight < best[parity][0]:
+                    best[parity] = (weight, mask)
+        parity = 0 if best[0][0] <= best[1][0] else 1
+        weight, mask = best[parity]
+        if math.isfinite(weight) and weight >= bounds[1-parity] - _EPS:
+            found = self._search(syndrome, weight)
+            if found is not None:
+                mask = found[1]
+        return mask
+
+    def _lift_color(self, c: int, matched: dict) -> int|None:
+        # The correction from the matched edges around the vertices of color
+        # c, as a bitset of errors, or None if some edges cannot be lifted.
+        incident = defaultdict(list)
+        correction = 0
+        for (L, edges) in matched.items():
+            if c not in L:
+                continue
+            for e in edges:
+                touching = [x for x in e if self._vertex_colors[x] == c]
+                if len(touching) == 0:
+                    i = self._direct.get((L, e))
+                    if i is None:
+                        return None
+                    correction |= 1 << i
+                for x in touching:
+                    incident[x].append((L, e))
+        for (x, local) in incident.items():
+            lifted = self._lift(x, local)
+            if lifted is None:
+                return None
+            # Errors around two vertices of color c may be lifted at both.
+            correction |= lifted
+        return correction
+
+    def _evaluate(self, correction: int) -> tuple[int, float, int]:
+        # Returns the syndrome (as a bitset), weight and observables of the
+        # correction (a bitset of errors).
+        bits, weight, mask = 0, 0, 0
+        while correction:
+            i = (correction & -correction).bit_length() - 1
+            correction ^= 1 << i
+            bits ^= self._error_bits[i]
+            weight, mask = weight + self._error_weights[i], mask ^ self._error_obs[i]
+        return bits, weight, mask
+
+    def _search(self, syndrome: int, bound: float) -> tuple[float, int]|None:
+        # Branch and bound over the errors: returns the lightest set of
+        # errors with the syndrome (a bitset) that is lighter than bound, as
+        # (weight, observables), or None. Each step adds an error with the
+        # lowest fired detector; a partial set is pruned if the errors it
+        # needs, counted by color, make it too heavy. At most
+        # MAX_SEARCH_NODES partial sets are visited.
+        best = None
+        seen = {}
+        stack = [(syndrome, 0.0, 0)]
+        nodes = 0
+        while len(stack) > 0 and nodes < MAX_SEARCH_NODES:
+            s, w, mask = stack.pop()
+            nodes += 1
+            if s == 0:
+                if w < bound - _EPS:
+                    bound, best = w, (w, mask)
+                continue
+            needed = max(-(-bin(s & cb).count('1') // k) for (cb, k) in zip(self._color_bits, self._max_per_color))
+            if w + needed*self._min_weight >= bound - _EPS or seen.get(s, math.inf) <= w + _EPS:
+                continue
+            seen[s] = w
+            x = (s & -s).bit_length() - 1
+            for i in self._errors_at[x]:
+                stack.append((s ^ self._error_bits[i], w + self._error_weights[i], mask ^ self._error_obs[i]))
+        return best
+
+    def _lift(self, x: int, local: list) -> int|None:
+        # Finds the lightest errors around x whose local edges are those in
+        # local (mod 2), as a bitset, or None if there are none. This is a
+        # minimum T-join in the graph whose nodes are the local edges (plus
+        # _NONE, for errors with a single local edge) and whose edges are
+        # the errors.
+        terminals = list(local)
+        if len(terminals) % 2 == 1:
+            terminals.append(_NONE)
+        if len(terminals) == 2:
+            _, errors = self._lift_paths_from(x, terminals[0])
+            return errors.get(terminals[1])
+        gr = nx.Graph()
+        for (i, s) in enumerate(terminals):
+            dist, _ = self._lift_paths_from(x, s)
+            for j in range(i+1, len(terminals)):
+                if terminals[j] in dist:
+                    gr.add_edge(i, j, weight=dist[terminals[j]])
+        matching = nx.min_weight_matching(gr)
+        if 2*len(matching) < len(terminals):
+            return None
+        out = 0
+        for (i, j) in matching:
+            _, errors = self._lift_paths_from(x, terminals[i])
+            out ^= errors[terminals[j]]
+        return out
+
+    def _lift_paths_from(self, x: int, s) -> tuple[dict, dict]:
+        # Distances and errors (as bitsets) of the shortest paths from s in
+        # the lifting graph of x.
+        if (x, s) not in self._lift_paths:
+            gr = self._lift_graph(x)
+            if s not in gr:
+                return {}, {}
+            pred, dist = nx.dijkstra_predecessor_and_distance(gr, s)
+            errors = {s: 0}
+            for v in sorted(dist, key=dist.get):
+                if v != s:
+                    u = pred[v][0]
+                    errors[v] = errors[u] ^ (1 << gr.edges[u, v]['error'])
+            self._lift_paths[(x, s)] = (dist, errors)
+        return self._lift_paths[(x, s)]
+
+    def _lift_graph(self, x: int) -> nx.Graph:
+        if x not in self._lift_graphs:
+            gr = nx.Graph()
+            for (local, i) in self._generators[x]:
+                u, v = (local[0], local[1]) if len(local) == 2 else (local[0], _NONE)
+                w = self._error_weights[i]
+                if not gr.has_edge(u, v) or w < gr.edges[u, v]['weight']:
+                    gr.add_edge(u, v, weight=w, error=i)
+            self._lift_graphs[x] = gr
+        return self._lift_graphs[x]
+
+class RestrictedLattice:
+    """
+        The restricted lattice of a pair of colors: the detectors of those
+        colors and the boundaries of those colors (vertices n+c), with an
+        edge for each error's edge on them. Parallel edges are merged into
+        one with the combined probability. Shortest-path distances and
+        predecessors between all of its vertices are computed here.
+    """
+    def __init__(self, n_detectors: int, colors: tuple[int, int], errors: list):
+        self.colors = colors
+        probs = {}
+        for (p, _, _, edges) in errors:
+            for (L, e) in edges:
+                if L == colors:
+                    q = probs.get(e, 0)
+                    probs[e] = q*(1-p) + p*(1-q)
+        gr = nx.Graph()
+        gr.add_weighted_edges_from((u, v, _error_weight(p)) for ((u, v), p) in probs.items())
+        self.boundaries = [n_detectors + c for c in colors]
+        gr.add_nodes_from(self.boundaries)
+        # Vertices by local index, and the local index of each vertex.
+        self.vertices = np.array(sorted(gr.nodes()), dtype=np.int64)
+        self.index = np.full(n_detectors + 3, -1, dtype=np.int64)
+        self.index[self.vertices] = np.arange(len(self.vertices))
+        m = len(self.vertices)
+        self.dist = np.full((m, m), np.inf)
+        self.pred = np.full((m, m), -1, dtype=np.int64)
+        for (i, src) in enumerate(self.vertices.tolist()):
+            pred, dist = nx.dijkstra_predecessor_and_distance(gr, src)
+            targets = list(dist)
+            self.dist[i, self.index[targets]] = [dist[v] for v in targets]
+            others = [v for v in targets if v != src]
+            self.pred[i, self.index[others]] = self.index[[pred[v][0] for v in others]]
+
+    def match(self, fired: np.ndarray) -> tuple[set, float]:
+        """
+            Matches the fired vertices (detectors and boundaries of this
+            lattice's colors, an even number of them) in pairs. Returns the
+            edges of the matched paths, mod 2, and the weight of the
+            matching.
+        """
+        edges = set()
+        if len(fired) == 0:
+            return edges, 0.0
+        local = self.index[fired]
+        dist = self.dist[np.ix_(local, local)]
+        weight = 0.0
+        for (i, j) in _perfect_matching(dist):
+            self._add_path(edges, local[i], local[j])
+            weight += dist[i, j]
+        return edges, weight
+
+    def _add_path(self, edges: set, src: int, dst: int) -> None:
+        v = dst
+        while v != src:
+            u = self.pred[src, v]
+            if u < 0:
+                return
+            e = tuple(sorted((int(self.vertices[u]), int(self.vertices[v]))))
+            edges.symmetric_difference_update([e])
+            v = u
+
+def _perfect_matching(dist: np.ndarray) -> list[tuple[int, int]]:
+    # Minimum-weight perfect matching of an even number of vertices, as
+    # pairs (i, j) with i < j.
+    k = len(dist)
+    if k <= MAX_ENUMERATED_MATCHING:
+        # Each pair is counted from both ends, which does not change the
+        # lightest matching.
+        table = _matching_table(k)
+        best = table[np.argmin(dist[np.arange(k), table].sum(axis=1))]
+        return [(i, j) for (i, j) in enumerate(best.tolist()) if i < j]
+    gr = nx.Graph()
+    for i in range(k):
+        for j in range(i+1, k):
+            if np.isfinite(dist[i, j]):
+                gr.add_edge(i, j, weight=dist[i, j])
+    return [(min(i, j), max(i, j)) for (i, j) in nx.min_weight_matching(gr)]
+
+_matching_tables = {}
+
+def _matching_table(k: int) -> np.ndarray:
+    # Every perfect matching of k vertices, one per row: entry i is the
+    # partner of vertex i.
+    if k not in _matching_tables:
+        rows = []
+        for matching in _perfect_matchings(list(range(k))):
+            row = [0]*k
+            for (i, j) in matching:
+                row[i], row[j] = j, i
+            rows.append(row)
+        _matching_tables[k] = np.array(rows, dtype=np.int64).reshape(-1, k)
+    return _matching_tables[k]
+
+def _perfect_matchings(vertices: list[int]):
+    if len(vertices) == 0:
+        yield []
+        return
+    v, rest = vertices[0], vertices[1:]
+    for (i, u) in enumerate(rest):
+        for m in _perfect_matchings(rest[:i] + rest[i+1:]):
+            yield [(v, u)] + m
+
+def _restricted_errors(dem: 'stim.DetectorErrorModel', colors: np.ndarray) -> list[tuple[float, int, list, list]]:
+    # Returns (p, observable mask, colored detectors, edges) for each error
+    # of the DEM, where edges holds the error's (lattice, edge) on each
+    # restricted lattice. An error with an odd number of detectors of some
+    # color also has the boundary (n+c) of each color c it has no detectors
+    # of. Errors with more than two vertices on some lattice are dropped.
+    n = len(colors)
+    out = []
+    for inst in dem.flattened():
+        if inst.type != 'error':
+            continue
+        p = inst.args_copy()[0]
+        if p == 0:
+            continue
+        dets, mask = [], 0
+        for t in inst.targets_copy():
+            if t.is_relative_detector_id() and colors[t.val] >= 0:
+                dets.append(t.val)
+            elif t.is_logical_observable_id():
+                mask ^= 1 << t.val
+        counts = np.bincount(colors[dets], minlength=3)
+        vertices = [(x, colors[x]) for x in dets]
+        if np.any(counts % 2 == 1):
+            vertices.extend((n + c, c) for c in range(3) if counts[c] == 0)
+        edges = []
+        for L in [(0, 1), (0, 2), (1, 2)]:
+            r = [x for (x, c) in vertices if c in L]
+            if len(r) > 2:
+                break
+            if len(r) == 2:
+                edges.append((L, tuple(sorted(r))))
+        else:
+            if len(edges) > 0:
+                out.append((p, mask, dets, edges))
+    return out
+
+def _error_weight(p: float) -> float:
+    return max(math.log((1-p)/p), 1e-9)
@@ -3,81 +3,354 @@
     date:   12 January 2024
 
     This file contains code for algorithmically computing syndrome extraction schedules.
-    Requires cplex.
+    The 'cplex' backend requires docplex (and cplex); the 'greedy' backend is
+    pure Python.
 """
 
 from qonstruct.code_builder.base import *
+from qonstruct.cache import *
 
 import networkx as nx
 
-import docplex.mp
-from docplex.mp.model import Model
+try:
+    from docplex.mp.model import Model
+except ImportError:
+    Model = None
 
-def compute_syndrome_extraction_schedule(tanner_graph: nx.Graph):
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import hashlib
+import inspect
+import json
+
+SCHEDULE_CACHE_VERSION = 1
+
+def compute_syndrome_extraction_schedule(tanner_graph: nx.Graph,
+                                        processes: int = 1,
+                                        backend='auto',
+                                        cache_dir: str = None,
+                                        cache_max_bytes: int = DEFAULT_MAX_BYTES,
+                                        cache_tag: str = None):
     """
         Modifies the tanner_graph by setting the scheduling order for
-        each check vertex. This is done greedily with repeated calls
-        to CPLEX.
+        each check vertex. This is done greedily, one check at a time: each
+        check is constrained by the checks scheduled before it that share
+        data qubits with it.
+
+        The backend solves the problem for a single check. It is either a
+        key of SCHEDULER_BACKENDS ('cplex', 'greedy', or 'auto', which picks
+        'cplex' if docplex is installed) or a function with the same
+        signature as _cplex_schedule_check.
+
+        If processes > 1, checks are grouped into batches: a check goes in
+        the batch after the last batch holding a check before it that shares
+        data qubits with it. Checks in a batch have disjoint supports and are
+        solved in a process pool, against exactly the checks they would see
+        with one process, so the schedule does not depend on processes.
+
+        If cache_dir is set, schedules are cached on disk under the
+        fingerprint of the graph (see tanner_graph_fingerprint), the backend
+        and its options (e.g. the budget of the greedy backend, given with
+        functools.partial). A hit is applied to the graph without solving
+        anything; an entry that no longer matches the graph is discarded. A
+        backend function that is not in SCHEDULER_BACKENDS needs a cache_tag
+        that names it in the cache key.
     """
-    M = 100000
+    if backend == 'auto':
+        backend = 'cplex' if Model is not None else 'greedy'
+    solve = SCHEDULER_BACKENDS[backend] if isinstance(backend, str) else backend
+
+    if cache_dir is not None:
+        fingerprint = tanner_graph_fingerprint(tanner_graph)
+        key = 'schedule-%s-%s' % (fingerprint, _schedule_cache_tag(solve, cache_tag))
+        if _load_cached_schedule(tanner_graph, fingerprint, cache_dir, key):
+            return
 
     checks = tanner_graph.graph['checks']['all']
     max_check_weight = max(tanner_graph.degree(x) for x in checks)
-    for (i, ch) in enumerate(checks):
-        support = get_support(tanner_graph, ch)
-        # Develop the program. The objective of the program is to minimize the depth of the circuit.
-        prog = Model(name='ext')
-
-        max_of_all = prog.integer_var(name='max_of_all') # This is the depth of the circuit.
-
-        qu_var_map = {}
-        # Create a variable for each data qubit in the support.
-        for q in support:
-            v = prog.integer_var(name=str(q))
-            qu_var_map[q] = v
-            # Add constraints for q.
-            prog.add_constraint(v >= 1)
-            prog.add_constraint(v <= 2*max_check_weight)
-            prog.add_constraint(max_of_all >= v)
-        # Add uniqueness constraints.
-        for (ii, q1) in enumerate(support):
-            v1 = qu_var_map[q1]
-            for jj in range(ii+1, len(support)):
-                q2 = support[jj]
-                v2 = qu_var_map[q2]
-                # Add the constraint.
-                prog.add_constraint(v1 != v2)
-        # Add commutativity and timing constraints.
-        for j in range(0, i):
-            other_ch = checks[j]
-            schedule_order = tanner_graph.nodes[other_ch]['schedule_order']
-
-            ind_sum_array = []
-            for (t, q) in enumerate(schedule_order):
-                if q is None or q not in support:
-                    continue
-                v = qu_var_map[q]
-                prog.add_constraint(v != t) 
-                # If ch and other_ch are different types, add commutativity constraints.
-                if tanner_graph.nodes[ch]['node_type'] == tanner_graph.nodes[other_ch]['node_type']:
-                    continue
-                y = prog.binary_var()
-                prog.add_constraint(v - t <= M*y)
-                prog.add_constraint(t - v <= M*(1-y))
-                ind_sum_array.append(y)
-            # Require that the ind_sum_array is even.
-            y = prog.integer_var()
-            prog.add_constraint(y >= 0)
-            prog.add_constraint(prog.sum(ind_sum_array) == 2*y)
-        prog.minimize(max_of_all)
-        soln = prog.solve()
-        depth = int(round(soln.get_var_value(max_of_all)))
-
-        schedule_order = [None for _ in range(depth)]
-        for q in support:
-            v = qu_var_map[q]
-            t = int(round(soln.get_var_value(v)))
-            # As t is 1-indexed, the actual time is t-1.
-            schedule_order[t-1] = q
+    overlaps = get_check_overlaps(tanner_graph, 'all')
+
+    if processes > 1:
+        batches = _dependency_batches(overlaps)
+    else:
+        batches = [[i] for i in range(len(checks))]
+    scheduled = [False for _ in checks]
+
+    def make_problem(i: int):
+        ch = checks[i]
+        neighbors = [(tanner_graph.nodes[checks[j]]['node_type'], tanner_graph.nodes[checks[j]]['schedule_order'])
+                        for j in overlaps[i] if scheduled[j]]
+        return (get_support(tanner_graph, ch), tanner_graph.nodes[ch]['node_type'], neighbors, max_check_weight)
+
+    executor = ProcessPoolExecutor(processes) if processes > 1 else None
+    try:
+        for batch in batches:
+            problems = [make_problem(i) for i in batch]
+            if executor is None or len(batch) == 1:
+                results = map(solve, problems)
+            else:
+                results = executor.map(solve, problems,
+                                        chunksize=max(1, len(batch) // (4*processes)))
+            for (i, schedule_order) in zip(batch, results):
+                tanner_graph.nodes[checks[i]]['schedule_order'] = schedule_order
+                scheduled[i] = True
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if cache_dir is not None:
+        entry = {
+            'version': SCHEDULE_CACHE_VERSION,
+            'fingerprint': fingerprint,
+            'schedules': [tanner_graph.nodes[ch]['schedule_order'] for ch in checks]
+        }
+        cache_store(cache_dir, key, json.dumps(entry).encode(), cache_max_bytes)
+
+def _schedule_cache_tag(solve, cache_tag: str|None) -> str:
+    # Names the backend and hashes its options: the arguments bound with
+    # functools.partial, over the defaults of the backend function.
+    func, args, options = solve, (), {}
+    if isinstance(solve, partial):
+        func, args, options = solve.func, solve.args, solve.keywords
+    if cache_tag is None:
+        cache_tag = next((name for (name, f) in SCHEDULER_BACKENDS.items() if f is func), None)
+        if cache_tag is None:
+            raise ValueError('caching a schedule from a backend function requires a cache_tag')
+    try:
+        params = list(inspect.signature(func).parameters.values())[1:]
+    except (TypeError, ValueError):
+        params = []
+    defaults = {p.name: p.default for p in params if p.default is not inspect.Parameter.empty}
+    content = [list(args), {**defaults, **options}]
+    return '%s-%s' % (cache_tag, hashlib.sha256(json.dumps(content, sort_keys=True, default=repr).encode()).hexdigest()[:16])
+
+def _load_cached_schedule(tanner_graph: nx.Graph, fingerprint: str, cache_dir: str, key: str) -> bool:
+    # Returns True and sets the schedule orders on a hit. Stale or corrupt
+    # entries are removed.
+    data = cache_load(cache_dir, key)
+    if data is None:
+        return False
+    checks = tanner_graph.graph['checks']['all']
+    try:
+        entry = json.loads(data)
+        schedules = entry['schedules']
+        stale = entry['version'] != SCHEDULE_CACHE_VERSION\
+                    or entry['fingerprint'] != fingerprint\
+                    or len(schedules) != len(checks)\
+                    or any(set(q for q in so if q is not None) != set(tanner_graph.neighbors(ch))
+                            for (ch, so) in zip(checks, schedules))
+    except (ValueError, KeyError, TypeError):
+        stale = True
+    if stale:
+        cache_remove(cache_dir, key)
+        return False
+    for (ch, schedule_order) in zip(checks, schedules):
         tanner_graph.nodes[ch]['schedule_order'] = schedule_order
+    return True
+
+def _dependency_batches(overlaps: list[list[int]]) -> list[list[int]]:
+    # Check i goes in the batch after those of the overlapping checks j < i.
+    # Overlapping checks are never in the same batch, and the checks j > i
+    # that overlap with i are in later batches.
+    level = []
+    for (i, nbrs) in enumerate(overlaps):
+        level.append(1 + max((level[j] for j in nbrs if j < i), default=-1))
+    batches = [[] for _ in range(max(level, default=-1)+1)]
+    for (i, k) in enumerate(level):
+        batches[k].append(i)
+    return batches
+
+def verify_syndrome_extraction_schedule(tanner_graph: nx.Graph) -> bool:
+    """
+        Returns True if the schedule orders of the tanner_graph are valid:
+        each check's schedule contains exactly its support, no data qubit is
+        used by two checks at the same time, and every pair of overlapping X
+        and Z checks commutes (the number of shared qubits where one check
+        goes first is even).
+    """
+    checks = tanner_graph.graph['checks']['all']
+    times = []
+    for ch in checks:
+        schedule_order = tanner_graph.nodes[ch]['schedule_order']
+        t_map = {q: t for (t, q) in enumerate(schedule_order) if q is not None}
+        if len(t_map) != sum(q is not None for q in schedule_order):
+            return False
+        if set(t_map) != set(tanner_graph.neighbors(ch)):
+            return False
+        times.append(t_map)
+    for (i, nbrs) in enumerate(get_check_overlaps(tanner_graph, 'all')):
+        ti = times[i]
+        for j in nbrs:
+            if j < i:
+                continue
+            tj = times[j]
+            shared = [q for q in ti if q in tj]
+            if any(ti[q] == tj[q] for q in shared):
+                return False
+            if tanner_graph.nodes[checks[i]]['node_type'] == tanner_graph.nodes[checks[j]]['node_type']:
+                continue
+            if sum(ti[q] < tj[q] for q in shared) % 2 == 1:
+                return False
+    return True
+
+#
+# Backends. Each takes a tuple (support, check_type, neighbors, max_check_weight),
+# where neighbors is a list of (node_type, schedule_order) of the already
+# scheduled checks that overlap with the support, and returns the schedule
+# order of the check. Backends must be picklable (module-level functions) to
+# be used with processes > 1.
+#
+
+def _cplex_schedule_check(problem: tuple) -> list[int]:
+    """
+        Solves the scheduling program of a single check with CPLEX.
+    """
+    if Model is None:
+        raise ImportError('the cplex scheduling backend requires docplex')
+    support, check_type, neighbors, max_check_weight = problem
+    M = 100000
+    # Develop the program. The objective of the program is to minimize the depth of the circuit.
+    prog = Model(name='ext')
+
+    max_of_all = prog.integer_var(name='max_of_all') # This is the depth of the circuit.
+
+    qu_var_map = {}
+    # Create a variable for each data qubit in the support.
+    for q in support:
+        v = prog.integer_var(name=str(q))
+        qu_var_map[q] = v
+        # Add constraints for q.
+        prog.add_constraint(v >= 1)
+        prog.add_constraint(v <= 2*max_check_weight)
+        prog.add_constraint(max_of_all >= v)
+    # Add uniqueness constraints.
+    for (ii, q1) in enumerate(support):
+        v1 = qu_var_map[q1]
+        for jj in range(ii+1, len(support)):
+            q2 = support[jj]
+            v2 = qu_var_map[q2]
+            # Add the constraint.
+            prog.add_constraint(v1 != v2)
+    # Add commutativity and timing constraints.
+    for (other_type, schedule_order) in neighbors:
+        ind_sum_array = []
+        for (t, q) in enumerate(schedule_order):
+            if q is None or q not in qu_var_map:
+                continue
+            # The variables are 1-indexed, schedule orders are 0-indexed.
+            t += 1
+            v = qu_var_map[q]
+            prog.add_constraint(v != t)
+            # If ch and other_ch are different types, add commutativity constraints.
+            if check_type == other_type:
+                continue
+            y = prog.binary_var()
+            prog.add_constraint(v - t <= M*y)
+            prog.add_constraint(t - v <= M*(1-y))
+            ind_sum_array.append(y)
+        if len(ind_sum_array) == 0:
+            continue
+        # Require that the ind_sum_array is even.
+        y = prog.integer_var()
+        prog.add_constraint(y >= 0)
+        prog.add_constraint(prog.sum(ind_sum_array) == 2*y)
+    prog.minimize(max_of_all)
+    soln = prog.solve()
+    depth = int(round(soln.get_var_value(max_of_all)))
+
+    schedule_order = [None for _ in range(depth)]
+    for q in support:
+        v = qu_var_map[q]
+        t = int(round(soln.get_var_value(v)))
+        # As t is 1-indexed, the actual time is t-1.
+        schedule_order[t-1] = q
+    return schedule_order
+
+def _greedy_schedule_check(problem: tuple, budget: int = 20000) -> list[int]:
+    """
+        Solver-free backend. Finds the shallowest valid schedule by
+        backtracking over depths len(support), ..., 2*max_check_weight (the
+        same range as the CPLEX program). Among the schedules of that depth,
+        the one that uses the earliest times (smallest sum) is kept, which
+        leaves later time steps free for the checks scheduled afterwards.
+
+        The search at each depth is limited to budget assignments; if nothing
+        is found, all CNOTs are placed after the last use of the support by a
+        neighbor, which always commutes.
+    """
+    support, check_type, neighbors, max_check_weight = problem
+    # busy[q] holds the (1-indexed) times q is used by a neighbor. Each
+    # constraint maps the qubits shared with an opposite-type neighbor to
+    # their times in the neighbor's schedule.
+    busy = {q: set() for q in support}
+    constraints = []
+    for (other_type, schedule_order) in neighbors:
+        shared = {}
+        for (t, q) in enumerate(schedule_order):
+            if q is None or q not in busy:
+                continue
+            busy[q].add(t+1)
+            if other_type != check_type:
+                shared[q] = t+1
+        if len(shared) > 0:
+            constraints.append(shared)
+    # Assign the most constrained qubits first, and check each parity
+    # constraint as soon as all of its qubits are assigned.
+    order = sorted(support, key=lambda q: -(len(busy[q]) + sum(q in c for c in constraints)))
+    pos = {q: k for (k, q) in enumerate(order)}
+    closing = [[] for _ in order]
+    for c in constraints:
+        closing[max(pos[q] for q in c)].append(c)
+
+    times = None
+    for depth in range(len(support), 2*max_check_weight+1):
+        times = _search_schedule(order, busy, closing, depth, budget)
+        if times is not None:
+            break
+    if times is None:
+        last = max((t for q in support for t in busy[q]), default=0)
+        times = {q: last+1+k for (k, q) in enumerate(support)}
+
+    schedule_order = [None for _ in range(max(times.values(), default=0))]
+    for (q, t) in times.items():
+        schedule_order[t-1] = q
+    return schedule_order
+
+def _search_schedule(order: list[int], busy: dict, closing: list, depth: int, budget: int) -> dict:
+    # Branch and bound over assignments of distinct times in [1, depth],
+    # minimizing the sum of the times.
+    times, used = {}, set()
+    best, best_sum = None, None
+    visited = 0
+
+    def visit(k: int, partial_sum: int):
+        nonlocal visited, best, best_sum
+        if k == len(order):
+            best, best_sum = dict(times), partial_sum
+            return
+        q = order[k]
+        # The other remaining qubits take at least the smallest free times.
+        free = [t for t in range(1, depth+1) if t not in used]
+        rest = sum(free[:len(order)-k-1])
+        for t in free:
+            if t in busy[q]:
+                continue
+            if best_sum is not None and partial_sum + t + rest >= best_sum:
+                break
+            visited += 1
+            if visited > budget:
+                return
+            times[q] = t
+            used.add(t)
+            if all(sum(times[x] > c[x] for x in c) % 2 == 0 for c in closing[k]):
+                visit(k+1, partial_sum+t)
+            used.discard(t)
+            del times[q]
+    visit(0, 0)
+    return best
 
+SCHEDULER_BACKENDS = {
+    'cplex': _cplex_schedule_check,
+    'greedy': _greedy_schedule_check
+}
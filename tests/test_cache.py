@@ -0,0 +1,55 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Tests for the on-disk cache and the schedule cache built on it.
+"""
+
+from qonstruct.cache import *
+from qonstruct.code_builder.color_code import make_hexagonal
+from qonstruct.scheduling import *
+from qonstruct.scheduling import _greedy_schedule_check
+
+import pytest
+
+import os
+from functools import partial
+
+def test_load_survives_failed_touch(tmp_path, monkeypatch):
+    cache_store(str(tmp_path), 'key', b'data')
+    def utime(*args, **kwargs):
+        raise PermissionError('read-only cache')
+    monkeypatch.setattr(os, 'utime', utime)
+    assert cache_load(str(tmp_path), 'key') == b'data'
+
+def test_schedule_cache_hit(tmp_path):
+    calls = []
+    def backend(problem):
+        calls.append(problem)
+        return _greedy_schedule_check(problem)
+    gr = make_hexagonal(3)
+    compute_syndrome_extraction_schedule(gr, backend=backend, cache_dir=str(tmp_path), cache_tag='counting')
+    assert len(calls) == len(gr.graph['checks']['all'])
+    cached = make_hexagonal(3)
+    compute_syndrome_extraction_schedule(cached, backend=backend, cache_dir=str(tmp_path), cache_tag='counting')
+    # The second run does not call the backend.
+    assert len(calls) == len(gr.graph['checks']['all'])
+    for ch in gr.graph['checks']['all']:
+        assert cached.nodes[ch]['schedule_order'] == gr.nodes[ch]['schedule_order']
+
+def test_schedule_cache_needs_tag_for_functions(tmp_path):
+    gr = make_hexagonal(3)
+    def backend(problem):
+        return _greedy_schedule_check(problem)
+    with pytest.raises(ValueError):
+        compute_syndrome_extraction_schedule(gr, backend=backend, cache_dir=str(tmp_path))
+    compute_syndrome_extraction_schedule(gr, backend=backend, cache_dir=str(tmp_path), cache_tag='wrapped')
+    assert verify_syndrome_extraction_schedule(gr)
+    assert len(os.listdir(tmp_path)) == 1
+
+def test_schedule_cache_key_has_backend_options(tmp_path):
+    for backend in ['greedy', partial(_greedy_schedule_check, budget=20000), partial(_greedy_schedule_check, budget=100)]:
+        compute_syndrome_extraction_schedule(make_hexagonal(3), backend=backend, cache_dir=str(tmp_path))
+    # The default budget is the same entry as the 'greedy' backend; a
+    # different budget is a new entry.
+    assert len(os.listdir(tmp_path)) == 2
@@ -0,0 +1,31 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Tests for coloring color code Tanner graphs.
+"""
+
+from qonstruct.code_builder.base import *
+from qonstruct.code_builder.color_code import *
+from qonstruct.io import *
+
+import pytest
+
+@pytest.mark.parametrize('d', [3, 5, 7])
+def test_coloring_is_proper(d):
+    gr = make_hexagonal(d)
+    color_tanner_graph(gr)
+    for q in gr.graph['data_qubits']:
+        colors = [gr.nodes[ch]['color'] for ch in gr.neighbors(q) if gr.nodes[ch]['node_type'] == 'x']
+        assert len(colors) == len(set(colors))
+
+def test_recoloring_keeps_one_copy(tmp_path):
+    path = str(tmp_path / 'hex.txt')
+    write_tanner_graph_file(make_hexagonal(5), path)
+    gr = read_tanner_graph_file(path)
+    n = len(gr.graph['plaquettes'])
+    color_tanner_graph(gr)
+    color_tanner_graph(gr)
+    assert len(gr.graph['plaquettes']) == n
+    assert len(set(gr.graph['plaquettes'])) == n
+    assert all(len(checks) == 2 for checks in gr.graph['plaquette_check_map'].values())
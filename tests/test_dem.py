@@ -0,0 +1,71 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Tests for detector error model extraction and its on-disk cache.
+"""
+
+from qonstruct.code_builder.surface_code import make_rotated
+from qonstruct.scheduling import *
+from qonstruct.qes.manager import QesManager
+from qonstruct.qes.noise import NoiseModel
+from qonstruct.dem import *
+
+import pytest
+
+import os
+
+def _graph(d: int = 3) -> nx.Graph:
+    gr = make_rotated(d)
+    compute_syndrome_extraction_schedule(gr, backend='greedy')
+    return gr
+
+def _direct_dem(gr: nx.Graph, rounds: int, noise: NoiseModel, memory='z', decompose_errors=True):
+    # The DEM computed directly, without the cache.
+    mgr = QesManager(gr)
+    mgr.memory = memory
+    mgr.noise = noise
+    return mgr.stim_circuit(rounds).detector_error_model(decompose_errors=decompose_errors)
+
+def test_cache_hit(tmp_path, monkeypatch):
+    gr = _graph()
+    noise = NoiseModel.uniform(1e-3)
+    dem = get_detector_error_model(gr, 3, noise, cache_dir=str(tmp_path))
+    assert dem == _direct_dem(gr, 3, noise)
+    # A hit does not build the circuit.
+    def fail(self, rounds):
+        raise AssertionError('DEM recomputed on a cache hit')
+    monkeypatch.setattr(QesManager, 'stim_circuit', fail)
+    cached = get_detector_error_model(gr, 3, noise, cache_dir=str(tmp_path))
+    assert cached == dem and str(cached) == str(dem)
+    assert len(os.listdir(tmp_path)) == 1
+
+@pytest.mark.parametrize('change', ['noise', 'rounds', 'memory', 'decompose', 'schedule'])
+def test_cache_miss(tmp_path, change):
+    gr = _graph()
+    args = {'rounds': 3, 'noise': NoiseModel.uniform(1e-3), 'memory': 'z', 'decompose_errors': True}
+    get_detector_error_model(gr, cache_dir=str(tmp_path), **args)
+    if change == 'noise':
+        args['noise'] = NoiseModel.uniform(2e-3)
+    elif change == 'rounds':
+        args['rounds'] = 4
+    elif change == 'memory':
+        args['memory'] = 'x'
+    elif change == 'decompose':
+        args['decompose_errors'] = False
+    else:
+        ch = gr.graph['checks']['all'][0]
+        order = gr.nodes[ch]['schedule_order']
+        gr.nodes[ch]['schedule_order'] = order[1:] + order[:1]
+    dem = get_detector_error_model(gr, cache_dir=str(tmp_path), **args)
+    assert len(os.listdir(tmp_path)) == 2
+    assert dem == _direct_dem(gr, args['rounds'], args['noise'], args['memory'], args['decompose_errors'])
+
+def test_corrupt_entry_is_recomputed(tmp_path):
+    gr = _graph()
+    noise = NoiseModel.uniform(1e-3)
+    dem = get_detector_error_model(gr, 3, noise, cache_dir=str(tmp_path))
+    for name in os.listdir(tmp_path):
+        with open(os.path.join(tmp_path, name), 'w') as writer:
+            writer.write('error(0.1) D100000000000 L')
+    assert get_detector_error_model(gr, 3, noise, cache_dir=str(tmp_path)) == dem
@@ -0,0 +1,30 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Tests for the information-set distance estimator.
+"""
+
+from qonstruct.code_builder.base import *
+from qonstruct.code_builder.surface_code import make_rotated
+from qonstruct.code_builder.color_code import make_hexagonal
+from qonstruct.distance import *
+
+import numpy as np
+import pytest
+
+@pytest.mark.parametrize('make', [make_rotated, make_hexagonal])
+@pytest.mark.parametrize('d', [3, 5, 7])
+@pytest.mark.parametrize('is_x', [True, False])
+def test_estimate_reaches_distance(make, d, is_x):
+    gr = make(d)
+    weight, logical, trace = estimate_distance(gr, is_x, trials=200, seed=1)
+    assert weight == len(logical) == d
+    assert len(trace) == 200 and trace[-1] == d
+    assert all(0 < b <= a for (a, b) in zip(trace, trace[1:]) if a > 0)
+    # The operator commutes with the checks.
+    H = get_parity_check_matrix(gr, 'x' if is_x else 'z', 'dense')
+    index = {q: j for (j, q) in enumerate(gr.graph['data_qubits'])}
+    v = np.zeros(H.shape[1], dtype=np.uint8)
+    v[[index[q] for q in logical]] = 1
+    assert not np.any((H.astype(np.uint8) @ v) % 2)
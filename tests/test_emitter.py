@@ -0,0 +1,102 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Tests for the QES text output: repeat blocks and compressed sinks.
+"""
+
+from qonstruct.code_builder.surface_code import make_rotated
+from qonstruct.code_builder.color_code import *
+from qonstruct.scheduling import *
+from qonstruct.qes.manager import QesManager
+from qonstruct.qes.emitter import *
+
+import pytest
+
+import gzip
+import io
+
+def _manager(make, d: int, memory: str, flags: bool) -> QesManager:
+    gr = make(d)
+    compute_syndrome_extraction_schedule(gr, backend='greedy')
+    if flags:
+        color_tanner_graph(gr)
+    mgr = QesManager(gr)
+    mgr.memory = memory
+    if flags:
+        mgr.assign_flags()
+    return mgr
+
+def _write(mgr: QesManager, rounds: int, use_repeat: bool) -> str:
+    out = io.StringIO()
+    mgr.use_repeat = use_repeat
+    mgr.attach(out)
+    mgr.write_memory_experiment(rounds)
+    mgr.fclose()
+    return out.getvalue()
+
+def _expand(text: str) -> list[str]:
+    # Unrolls the repeat blocks, making the operands of their events
+    # absolute. Comments are dropped.
+    lines = [ln for ln in text.splitlines() if len(ln) > 0 and ln[0] != '#']
+    out = []
+    n_meas, n_events = 0, 0
+    def run(body: list[str], relative: bool):
+        nonlocal n_meas, n_events
+        i, first_event = 0, n_events
+        while i < len(body):
+            ln = body[i]
+            if ln.startswith('repeat'):
+                # Find the matching brace.
+                depth, j = 1, i+1
+                while depth > 0:
+                    depth += body[j].startswith('repeat') - (body[j] == '}')
+                    j += 1
+                for _ in range(int(ln.split()[1])):
+                    run(body[i+1:j-1], True)
+                i = j
+                continue
+            opname, _, rest = ln.partition(' ')
+            operands = [int(x) for x in rest.rstrip(';').split(',')] if ln[0] != '@' and len(rest) > 0 else []
+            if opname == 'measure':
+                n_meas += len(operands)
+            if opname == 'event':
+                if relative:
+                    operands = [first_event + operands[0]] + [n_meas + m for m in operands[1:]]
+                n_events += 1
+                ln = 'event %s;' % ','.join(map(str, operands))
+            out.append(ln)
+            i += 1
+    run(lines, False)
+    return out
+
+@pytest.mark.parametrize('memory', ['x', 'z'])
+@pytest.mark.parametrize('rounds', [1, 2, 3, 5])
+@pytest.mark.parametrize('make, d, flags', [(make_rotated, 3, False), (make_rotated, 5, False), (make_hexagonal, 5, True)])
+def test_repeat_matches_flat(make, d, flags, rounds, memory):
+    # A manager writes one experiment, so each output gets its own.
+    flat = _write(_manager(make, d, memory, flags), rounds, False)
+    compressed = _write(_manager(make, d, memory, flags), rounds, True)
+    assert 'repeat' not in flat
+    assert ('repeat' in compressed) == (rounds > 2)
+    expanded = _expand(compressed)
+    assert expanded == _expand(flat)
+    assert sum(ln.startswith('event') for ln in expanded) > 0
+
+@pytest.mark.parametrize('suffix', ['.gz', '.zst'])
+def test_compressed_sink(tmp_path, suffix):
+    if suffix == '.zst':
+        zstandard = pytest.importorskip('zstandard')
+    expected = _write(_manager(make_rotated, 3, 'z', False), 3, True)
+    mgr = _manager(make_rotated, 3, 'z', False)
+    path = str(tmp_path / ('out.qes' + suffix))
+    mgr.fopen(path)
+    mgr.write_memory_experiment(3)
+    mgr.fclose()
+    with open(path, 'rb') as reader:
+        data = reader.read()
+    if suffix == '.gz':
+        text = gzip.decompress(data).decode()
+    else:
+        text = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)).read().decode()
+    assert text == expected
@@ -0,0 +1,100 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Tests for flag assignment: the number and placement of flags, that
+    flagged circuits are deterministic without noise, and that flags catch
+    faults on the parity qubit.
+"""
+
+from qonstruct.code_builder.base import *
+from qonstruct.code_builder.color_code import *
+from qonstruct.scheduling import *
+from qonstruct.qes.manager import QesManager
+from qonstruct.qes.noise import NoiseModel
+from qonstruct.dem import *
+from qonstruct.io import *
+
+import numpy as np
+import pytest
+
+def _flagged_hex(d: int) -> tuple:
+    gr = make_hexagonal(d)
+    compute_syndrome_extraction_schedule(gr, backend='greedy')
+    color_tanner_graph(gr)
+    mgr = QesManager(gr)
+    return gr, mgr, mgr.assign_flags()
+
+@pytest.mark.parametrize('d', [3, 5])
+def test_one_flag_per_weight_6_check(d):
+    gr, mgr, n_flags = _flagged_hex(d)
+    checks = [ch for ch in gr.graph['checks']['all'] if gr.degree(ch) == 6]
+    assert n_flags == len(checks) == len(mgr.flag_qubits)
+    for ch in checks:
+        # The flag is on the middle CNOTs.
+        order = [q for q in gr.nodes[ch]['schedule_order'] if q is not None]
+        assert gr.nodes[ch]['flags'] == [order[2:4]]
+    assert mgr.assign_flags() == 0
+
+def test_flags_round_trip(tmp_path):
+    gr, mgr, _ = _flagged_hex(5)
+    path = str(tmp_path / 'hex.txt')
+    write_tanner_graph_file(gr, path)
+    copy = read_tanner_graph_file(path)
+    # Checks are renumbered when read, so match them by type and support.
+    def flags(g):
+        return {(g.nodes[ch]['node_type'], tuple(sorted(get_support(g, ch)))): g.nodes[ch].get('flags', [])
+                    for ch in g.graph['checks']['all']}
+    assert flags(copy) == flags(gr)
+    assert QesManager(copy).assign_flags() == 0
+
+@pytest.mark.parametrize('memory', ['x', 'z'])
+def test_flagged_circuit_is_deterministic(memory):
+    gr, mgr, _ = _flagged_hex(5)
+    mgr.memory = memory
+    circuit = mgr.stim_circuit(5)
+    detectors, observables = circuit.compile_detector_sampler().sample(16, separate_observables=True)
+    assert not detectors.any() and not observables.any()
+    # stim also checks that every detector and observable is deterministic.
+    circuit.detector_error_model(decompose_errors=False)
+
+@pytest.mark.parametrize('memory', ['x', 'z'])
+def test_flag_catches_parity_qubit_faults(memory):
+    import stim
+    gr, mgr, _ = _flagged_hex(5)
+    # Flags of checks of the other type are measured as events.
+    check_type, error = ('x', 'X_ERROR') if memory == 'z' else ('z', 'Z_ERROR')
+    mgr.memory = memory
+    # Gate noise separates the CNOT layers in the circuit; it is dropped below.
+    mgr.noise = NoiseModel(p_gate2=0.01)
+    noisy = mgr.stim_circuit(1)
+    flag_events = [i for (i, c) in sorted(noisy.get_detector_coordinates().items()) if c[0] == -1]
+    flagged = [ch for ch in mgr.flag_assignment_map if gr.nodes[ch]['node_type'] == check_type]
+    assert len(flag_events) == len(flagged)
+    for (ch, event) in zip(flagged, flag_events):
+        # CNOT layer 0 sets up the flags, 1 to 6 are the data CNOTs.
+        depth = len(gr.nodes[ch]['schedule_order'])
+        for layer in range(depth + 1):
+            circuit, n_cx = stim.Circuit(), 0
+            for inst in noisy:
+                if inst.name == 'DEPOLARIZE2':
+                    continue
+                circuit.append(inst)
+                if inst.name == 'CX':
+                    if n_cx == layer:
+                        circuit.append(error, [ch], 1.0)
+                    n_cx += 1
+            fired = np.flatnonzero(circuit.compile_detector_sampler().sample(1)[0])
+            assert event in fired
+
+def test_dem_does_not_change_graph(tmp_path):
+    gr = make_hexagonal(3)
+    compute_syndrome_extraction_schedule(gr, backend='greedy')
+    color_tanner_graph(gr)
+    noise = NoiseModel.uniform(1e-3)
+    dem = get_detector_error_model(gr, 2, noise, flag_min_weight=6, decompose_errors=False, cache_dir=str(tmp_path))
+    assert all('flags' not in gr.nodes[ch] for ch in gr.graph['checks']['all'])
+    # The second call hits the entry of the first.
+    again = get_detector_error_model(gr, 2, noise, flag_min_weight=6, decompose_errors=False, cache_dir=str(tmp_path))
+    assert again == dem
+    assert len(list(tmp_path.iterdir())) == 1
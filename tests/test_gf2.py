@@ -0,0 +1,73 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Tests for the bit-packed GF(2) engine, against the original row-by-row
+    elimination, which is kept here as a reference.
+"""
+
+from qonstruct.gf2 import *
+from qonstruct.utils import binrref, row, null
+
+import numpy as np
+import pytest
+
+def _reference_binrref(m: np.ndarray) -> tuple[np.ndarray, list[int]]:
+    u = m.copy()
+    pivots = []
+    r, p = 0, 0
+    while r < m.shape[0] and p < m.shape[1]:
+        if not u[r, p]:
+            i = r+1
+            while i < m.shape[0] and not u[i, p]:
+                i += 1
+            if i == m.shape[0]:
+                p += 1
+                continue
+            u[[r, i], :] = u[[i, r], :]
+        pivots.append(p)
+        for i in range(r+1, m.shape[0]):
+            if u[i, p]:
+                u[i] = np.logical_xor(u[i], u[r])
+        r += 1
+        p += 1
+    for i in reversed(range(len(pivots))):
+        for ii in range(i):
+            if u[ii, pivots[i]]:
+                u[ii] = np.logical_xor(u[ii], u[i])
+    return u, pivots
+
+def _matrices():
+    rng = np.random.default_rng(1)
+    # Shapes around the 64-bit word size, and sparse and dense fills.
+    for (rows, cols) in [(1, 1), (5, 9), (20, 63), (40, 64), (64, 65), (70, 130), (130, 70)]:
+        for density in [0.05, 0.5]:
+            yield rng.random((rows, cols)) < density
+    # Low rank: repeated rows.
+    base = rng.random((8, 100)) < 0.5
+    yield base[rng.integers(0, 8, size=30)]
+
+@pytest.mark.parametrize('m', list(_matrices()))
+def test_rref_matches_reference(m):
+    expected, pivots = _reference_binrref(m)
+    w, packed_pivots = rref_packed(pack(m), m.shape[1])
+    assert packed_pivots == pivots
+    assert np.array_equal(unpack(w, m.shape[1]), expected)
+    u, utils_pivots = binrref(m)
+    assert u.dtype == m.dtype and utils_pivots == pivots
+    assert np.array_equal(u, expected)
+    assert rank(m) == len(pivots)
+
+@pytest.mark.parametrize('m', list(_matrices()))
+def test_null_and_row(m):
+    n = null(m)
+    assert n.shape == (m.shape[1] - rank(m), m.shape[1])
+    assert not np.any((m.astype(np.uint8) @ n.T.astype(np.uint8)) % 2)
+    assert rank(n) == len(n)
+    r = row(m)
+    assert len(r) == rank(m) == rank(r)
+
+def test_pack_round_trip():
+    m = np.random.default_rng(2).random((7, 200)) < 0.5
+    assert pack(m).shape == (7, 4)
+    assert np.array_equal(unpack(pack(m), 200), m)
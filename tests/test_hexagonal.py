@@ -0,0 +1,75 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Tests that the array-based hexagonal color code builder gives the same
+    Tanner graph as the original one, which is kept here as a reference.
+"""
+
+from qonstruct.code_builder.base import *
+from qonstruct.code_builder.color_code import *
+
+import networkx as nx
+import pytest
+
+def _reference_hexagonal(d: int, both_at_once=True) -> nx.Graph:
+    # The original make_hexagonal, one qubit and check at a time.
+    gr = tanner_init()
+    offset, side_len = 2, (3*d - 1)//2
+    loc_map, check_locs, obs = {}, [], []
+    n = 0
+    for r in range(side_len):
+        row_off = offset
+        for c in range(r+1):
+            if row_off == 0:
+                check_locs.append((r, c))
+            else:
+                loc_map[(r, c)] = n
+                add_data_qubit(gr, n)
+                if c == 0:
+                    obs.append(n)
+                n += 1
+            row_off = (row_off+1) % 3
+        offset = (offset+1) % 3
+    add_observable(gr, obs, 'x')
+    add_observable(gr, obs, 'z')
+    get_loc = lambda _r, _c: loc_map.get((_r, _c))
+    for (plaq, (i, j)) in enumerate(check_locs):
+        a, b, c = get_loc(i-1, j-1), get_loc(i-1, j), get_loc(i, j+1)
+        d_, e, f = get_loc(i+1, j+1), get_loc(i+1, j), get_loc(i, j-1)
+        add_plaquette(gr, plaq, [a, b, c, d_, e, f], i%3)
+        for stabilizer in ['x', 'z']:
+            if both_at_once:
+                order = [b, c, d_, e, f, a]
+                schedule_order = order + [None]*6 if stabilizer == 'z' else [None]*6 + order
+            else:
+                schedule_order = [b, c, e, d_, a, f]
+            add_check(gr, n, stabilizer, [a, b, c, d_, e, f],
+                        color=i%3, plaquette=plaq, schedule_order=schedule_order)
+            set_plaquette(gr, n, plaq)
+            n += 1
+    return gr
+
+@pytest.mark.parametrize('d', [3, 5, 7, 9])
+@pytest.mark.parametrize('both_at_once', [True, False])
+def test_matches_reference(d, both_at_once):
+    gr = make_hexagonal(d, both_at_once)
+    ref = _reference_hexagonal(d, both_at_once)
+    assert list(gr.nodes(data=True)) == list(ref.nodes(data=True))
+    assert list(gr.edges()) == list(ref.edges())
+    for k in ['data_qubits', 'checks', 'obs_list', 'plaquettes', 'plaquette_support_map', 'plaquette_color_map']:
+        assert gr.graph[k] == ref.graph[k], k
+    assert dict(gr.graph['plaquette_check_map']) == dict(ref.graph['plaquette_check_map'])
+    for s in ['x', 'z']:
+        assert (get_parity_check_matrix(gr, s, 'dense') == get_parity_check_matrix(ref, s, 'dense')).all()
+
+@pytest.mark.parametrize('d', [3, 5, 7])
+def test_arrays_match_graph(d):
+    code = make_hexagonal_arrays(d)
+    gr = make_hexagonal(d)
+    assert code['n_data'] == len(gr.graph['data_qubits'])
+    assert code['observable'].tolist() == gr.graph['obs_list']['x'][0]
+    for (p, support) in enumerate(code['supports'].tolist()):
+        for ch in code['check_ids'][p].tolist():
+            assert set(get_support(gr, ch)) == set(q for q in support if q >= 0)
+            assert gr.nodes[ch]['color'] == code['colors'][p]
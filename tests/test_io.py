@@ -0,0 +1,147 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Tests for reading and writing Tanner graph files, in the text and binary
+    formats.
+"""
+
+from qonstruct.code_builder.base import *
+from qonstruct.code_builder.color_code import *
+from qonstruct.code_builder.surface_code import make_rotated
+from qonstruct.scheduling import *
+from qonstruct.io import *
+
+import numpy as np
+import pytest
+
+import gzip
+import lzma
+
+def _hex(d: int) -> nx.Graph:
+    gr = make_hexagonal(d)
+    compute_syndrome_extraction_schedule(gr, backend='greedy')
+    color_tanner_graph(gr)
+    return gr
+
+def _summary(gr: nx.Graph) -> dict:
+    # Checks are renumbered when read, so they are matched by type and
+    # support, and plaquettes by their support.
+    checks = {}
+    for ch in gr.graph['checks']['all']:
+        attrs = gr.nodes[ch]
+        p = attrs.get('plaquette')
+        key = (attrs['node_type'], tuple(sorted(get_support(gr, ch))))
+        checks[key] = (attrs.get('schedule_order'), attrs.get('color'),
+                        None if p is None else tuple(gr.graph['plaquette_support_map'][p]))
+    plaquettes = sorted((tuple(gr.graph['plaquette_support_map'][p]), gr.graph['plaquette_color_map'][p])
+                            for p in gr.graph['plaquettes'])
+    return {
+        'data_qubits': sorted(gr.graph['data_qubits']),
+        'obs_list': gr.graph['obs_list'],
+        'checks': checks,
+        'plaquettes': plaquettes
+    }
+
+@pytest.mark.parametrize('chunk_size', [64, 1 << 20])
+@pytest.mark.parametrize('d', [3, 5, 7])
+def test_round_trip(tmp_path, d, chunk_size):
+    gr = _hex(d)
+    path = str(tmp_path / 'hex.txt')
+    write_tanner_graph_file(gr, path)
+    with open(path) as reader:
+        assert any(ln.startswith('@schedule') for ln in reader)
+    copy = read_tanner_code_file(path, chunk_size=chunk_size).to_graph()
+    assert _summary(copy) == _summary(gr)
+    for s in ['x', 'z']:
+        assert get_parity_check_matrix(copy, s, 'dense').sum() == get_parity_check_matrix(gr, s, 'dense').sum()
+
+@pytest.mark.parametrize('compress', [gzip.open, lzma.open])
+def test_compressed(tmp_path, compress):
+    gr = _hex(5)
+    path = str(tmp_path / 'hex.txt')
+    write_tanner_graph_file(gr, path)
+    with open(path, 'rb') as reader, compress(str(tmp_path / 'hex.txt.z'), 'wb') as writer:
+        writer.write(reader.read())
+    plain = read_tanner_code_file(path).to_arrays()
+    packed = read_tanner_code_file(str(tmp_path / 'hex.txt.z'), chunk_size=100).to_arrays()
+    assert plain.keys() == packed.keys()
+    for k in plain:
+        assert np.array_equal(plain[k], packed[k]), k
+    assert _summary(read_tanner_graph_file(str(tmp_path / 'hex.txt.z'))) == _summary(gr)
+
+def test_plain_file_without_metadata(tmp_path):
+    gr = make_rotated(5)
+    path = str(tmp_path / 'rot.txt')
+    with open(path, 'w') as writer:
+        for ch in gr.graph['checks']['all']:
+            writer.write('%s,%s\n' % (gr.nodes[ch]['node_type'].upper(), ','.join(map(str, get_support(gr, ch)))))
+        for s in ['x', 'z']:
+            for obs in gr.graph['obs_list'][s]:
+                writer.write('O%s,%s\n' % (s.upper(), ','.join(map(str, obs))))
+    copy = read_tanner_graph_file(path)
+    assert sorted(copy.graph['data_qubits']) == sorted(gr.graph['data_qubits'])
+    assert copy.graph['obs_list'] == gr.graph['obs_list']
+    # X checks come first, numbered from one past the largest data qubit.
+    n = max(gr.graph['data_qubits']) + 1
+    assert copy.graph['checks']['all'] == list(range(n, n + len(gr.graph['checks']['all'])))
+    assert [copy.nodes[ch]['node_type'] for ch in copy.graph['checks']['all']] == sorted(
+                gr.nodes[ch]['node_type'] for ch in gr.graph['checks']['all'])
+
+def test_bad_indices(tmp_path):
+    path = str(tmp_path / 'bad.txt')
+    with open(path, 'w') as writer:
+        writer.write('X0,0,1,a\n')
+    with pytest.raises(ValueError):
+        read_tanner_code_file(path)
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_binary_round_trip(tmp_path, mmap):
+    gr = _hex(5)
+    path = str(tmp_path / 'hex.bin')
+    write_tanner_graph_binary(gr, path)
+    code = read_tanner_code_binary(path, mmap=mmap)
+    copy = code.to_graph()
+    assert list(copy.nodes(data=True)) == list(gr.nodes(data=True))
+    assert [(x, list(copy[x])) for x in copy] == [(x, list(gr[x])) for x in gr]
+    assert _summary(copy) == _summary(gr)
+    assert _summary(read_tanner_graph_binary(path)) == _summary(gr)
+    if mmap:
+        # Memory-mapped codes are read-only, and the file is not changed.
+        with open(path, 'rb') as reader:
+            data = reader.read()
+        ch = code.check_ids[0].item()
+        assert code.get_support(ch) == get_support(gr, ch)
+        with pytest.raises((AttributeError, ValueError)):
+            code.add_data_qubit(10**6)
+        with pytest.raises(ValueError):
+            code.set_color(ch, 0)
+        with open(path, 'rb') as reader:
+            assert reader.read() == data
+    else:
+        code.add_data_qubit(10**6)
+        assert 10**6 in code
+
+def test_binary_rejects_other_files(tmp_path):
+    path = str(tmp_path / 'hex.txt')
+    write_tanner_graph_file(_hex(3), path)
+    with pytest.raises(ValueError):
+        read_tanner_code_binary(path)
+
+def test_metadata_lines(tmp_path):
+    path = str(tmp_path / 'meta.txt')
+    with open(path, 'w') as writer:
+        writer.write('X0,0,1,2\nz0,1,2,3\nOX0,0,1\n')
+        writer.write('@schedule,x0,-,0,1,2\n@color,Z0,2\n@flag,Z0,1,2\n')
+        writer.write('@plaquette,7,1,0,1,2,-\n@check_plaquette,X0,7\n@unknown,X0\n')
+    gr = read_tanner_graph_file(path)
+    x, z = gr.graph['checks']['x'][0], gr.graph['checks']['z'][0]
+    assert gr.nodes[x]['schedule_order'] == [None, 0, 1, 2]
+    assert gr.nodes[z]['color'] == 2 and gr.nodes[z]['flags'] == [[1, 2]]
+    assert gr.graph['plaquette_support_map'][7] == [0, 1, 2, None]
+    assert gr.graph['plaquette_color_map'][7] == 1
+    assert gr.nodes[x]['plaquette'] == 7 and gr.graph['plaquette_check_map'][7] == [x]
+    with open(path, 'a') as writer:
+        writer.write('@color,X5,0\n')
+    with pytest.raises(ValueError):
+        read_tanner_graph_file(path)
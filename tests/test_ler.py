@@ -0,0 +1,48 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Tests for logical error rate estimation.
+"""
+
+from qonstruct.code_builder.surface_code import make_rotated
+from qonstruct.scheduling import *
+from qonstruct.qes.manager import QesManager
+from qonstruct.qes.noise import NoiseModel
+from qonstruct.ler import *
+
+import numpy as np
+import pytest
+
+def _circuit():
+    gr = make_rotated(3)
+    compute_syndrome_extraction_schedule(gr, backend='greedy')
+    mgr = QesManager(gr)
+    mgr.noise = NoiseModel.uniform(5e-3)
+    return mgr.stim_circuit(3)
+
+def test_seed_is_independent_of_processes():
+    circuit = _circuit()
+    results = [estimate_logical_error_rate(circuit, 'mwpm', max_shots=5000, batch_size=500, processes=p, seed=7)
+                    for p in [1, 2, 3]]
+    assert results[0]['shots'] == 5000
+    assert all(r['failures'] == results[0]['failures'] for r in results)
+    other = estimate_logical_error_rate(circuit, 'mwpm', max_shots=5000, batch_size=500, processes=1, seed=8)
+    assert other['failures'] != results[0]['failures']
+
+def test_no_observables():
+    import stim
+    circuit = stim.Circuit('X_ERROR(0.1) 0\nM 0\nDETECTOR rec[-1]')
+    with pytest.raises(ValueError):
+        estimate_logical_error_rate(circuit, 'mwpm', max_shots=100, processes=1)
+
+def test_cached_syndromes_are_bounded(monkeypatch):
+    monkeypatch.setattr('qonstruct.ler.MAX_CACHED_SYNDROMES', 4)
+    circuit = _circuit()
+    dem = circuit.detector_error_model(decompose_errors=True)
+    decoder = MwpmDecoder(dem)
+    detectors, _ = circuit.compile_detector_sampler(seed=1).sample(200, separate_observables=True, bit_packed=True)
+    predictions = decoder.decode_batch(detectors)
+    assert len(decoder._predictions) == 4
+    fresh = MwpmDecoder(dem)
+    assert np.array_equal(predictions, np.concatenate([fresh.decode_batch(row[None, :]) for row in detectors]))
@@ -0,0 +1,60 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Tests for check overlaps, against the original pairwise check graph,
+    which is kept here as a reference.
+"""
+
+from qonstruct.code_builder.base import *
+from qonstruct.code_builder.surface_code import make_rotated
+from qonstruct.code_builder.color_code import make_hexagonal
+from qonstruct.utils import make_support_graph
+
+import networkx as nx
+import pytest
+
+def _reference_check_graph(gr: nx.Graph, check_type: str) -> nx.Graph:
+    cgr = nx.Graph()
+    for x in gr.graph['checks'][check_type]:
+        for y in gr.graph['checks'][check_type]:
+            if x != y and not cgr.has_edge(x, y) and len(list(nx.common_neighbors(gr, x, y))) > 0:
+                cgr.add_edge(x, y)
+    return cgr
+
+def _reference_support_graph(gr: nx.Graph, op_type: str) -> nx.Graph:
+    sgr = nx.Graph()
+    sgr.add_nodes_from(x for x in gr.nodes() if gr.nodes[x]['node_type'] == op_type)
+    for x in sgr.nodes():
+        for y in sgr.nodes():
+            if x != y and len(list(nx.common_neighbors(gr, x, y))) > 0:
+                sgr.add_edge(x, y)
+    return sgr
+
+def _adjacency(gr: nx.Graph) -> list:
+    return [(x, list(gr[x])) for x in gr.nodes()]
+
+@pytest.mark.parametrize('make', [make_rotated, make_hexagonal])
+@pytest.mark.parametrize('check_type', ['x', 'z', 'all'])
+def test_overlaps_match_reference(make, check_type):
+    gr = make(5)
+    ref = _reference_check_graph(gr, check_type)
+    checks = gr.graph['checks'][check_type]
+    overlaps = get_check_overlaps(gr, check_type)
+    assert len(overlaps) == len(checks)
+    for (i, nbrs) in enumerate(overlaps):
+        assert nbrs == sorted(nbrs)
+        expected = set(ref.neighbors(checks[i])) if checks[i] in ref else set()
+        assert set(checks[j] for j in nbrs) == expected
+    # The check graph is the same, down to its node and adjacency order.
+    assert _adjacency(make_check_graph(gr, check_type)) == _adjacency(ref)
+    # Off the diagonal, the overlap matrix is nonzero exactly on overlaps.
+    m = get_check_overlap_matrix(gr, check_type).toarray()
+    for i in range(len(checks)):
+        assert [j for j in range(len(checks)) if j != i and m[i, j] > 0] == overlaps[i]
+        assert m[i, i] == gr.degree(checks[i])
+
+@pytest.mark.parametrize('op_type', ['x', 'z'])
+def test_support_graph_matches_reference(op_type):
+    gr = make_hexagonal(5)
+    assert _adjacency(make_support_graph(gr, op_type)) == _adjacency(_reference_support_graph(gr, op_type))
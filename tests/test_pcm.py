@@ -0,0 +1,58 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Tests that the parity-check matrices kept with a Tanner graph match the
+    graph as it is built.
+"""
+
+from qonstruct.code_builder.base import *
+from qonstruct.code_builder.surface_code import make_rotated
+from qonstruct.code_builder.color_code import make_hexagonal
+
+import numpy as np
+import pytest
+
+def _dense_from_graph(gr: nx.Graph, check_type: str) -> np.ndarray:
+    data_qubits = gr.graph['data_qubits']
+    m = np.zeros((len(gr.graph['checks'][check_type]), len(data_qubits)), dtype=bool)
+    for (i, ch) in enumerate(gr.graph['checks'][check_type]):
+        for q in gr.neighbors(ch):
+            m[i, data_qubits.index(q)] = True
+    return m
+
+def _check_pcm(gr: nx.Graph) -> None:
+    for s in ['x', 'z']:
+        expected = _dense_from_graph(gr, s)
+        assert np.array_equal(get_parity_check_matrix(gr, s, 'dense'), expected)
+        assert np.array_equal(get_parity_check_matrix(gr, s, 'csr').toarray().astype(bool), expected)
+        assert np.array_equal(get_parity_check_matrix(gr, s, 'csc').toarray().astype(bool), expected)
+        indptr, indices = get_parity_check_csc(gr, s)
+        assert len(indptr) == len(gr.graph['data_qubits']) + 1
+        for j in range(len(indptr)-1):
+            assert indices[indptr[j]:indptr[j+1]].tolist() == np.flatnonzero(expected[:, j]).tolist()
+
+def test_pcm_follows_incremental_build():
+    gr = tanner_init()
+    for q in range(4):
+        add_data_qubit(gr, q)
+    add_check(gr, 100, 'x', [0, 1, 2])
+    _check_pcm(gr)
+    # New data qubits, given directly or through a check's support, and
+    # repeated or missing (None) support entries.
+    add_data_qubit(gr, 4)
+    add_check(gr, 101, 'z', [2, 3, 4, 4, None])
+    _check_pcm(gr)
+    add_check(gr, 102, 'x', [4, 5, 6])
+    add_checks_from(gr, [103, 104], ['z', 'x'], [[0, 7], [7, 1, None]])
+    _check_pcm(gr)
+    assert gr.graph['data_qubits'] == list(range(8))
+
+@pytest.mark.parametrize('make', [make_rotated, make_hexagonal])
+def test_pcm_of_codes(make):
+    gr = make(5)
+    _check_pcm(gr)
+    # Graphs without the matrices (e.g. old pickles) are indexed on demand.
+    for k in ['pcm', 'pcm_cache', 'data_qubit_index']:
+        del gr.graph[k]
+    _check_pcm(gr)
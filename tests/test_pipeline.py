@@ -0,0 +1,44 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Tests for the batch pipeline: results and resuming from the manifest.
+"""
+
+from qonstruct.pipeline import *
+
+import pytest
+
+import json
+import os
+
+def _manifest(output_dir: str) -> list[str]:
+    with open(os.path.join(output_dir, MANIFEST_FILE)) as reader:
+        return reader.read().splitlines()
+
+def test_resume_from_manifest(tmp_path):
+    out = str(tmp_path)
+    first = run_pipeline('rotated', [3, 5], out, processes=2, rounds=2)
+    assert [r['status'] for r in first] == ['ok', 'ok']
+    assert [r['distance'] for r in first] == [{'x': 3, 'z': 3}, {'x': 5, 'z': 5}]
+    for r in first:
+        assert os.path.exists(r['code_file']) and os.path.exists(r['circuit_file'])
+    assert len(_manifest(out)) == 2
+    # An interrupted write leaves a partial line, which is skipped.
+    with open(os.path.join(out, MANIFEST_FILE), 'a') as writer:
+        writer.write('{"family": "rotated", "par')
+    second = run_pipeline('rotated', [3, 5, 7], out, processes=2, rounds=2)
+    # Only d=7 ran; the others are the records of the first run.
+    assert second[:2] == first
+    assert second[2]['status'] == 'ok' and second[2]['distance'] == {'x': 7, 'z': 7}
+    lines = _manifest(out)
+    assert len(lines) == 4 and json.loads(lines[-1])['params'] == {'d': 7}
+
+def test_failures_are_retried(tmp_path):
+    out = str(tmp_path)
+    for k in range(2):
+        [record] = run_pipeline('rotated', [{'d': 'three'}], out, processes=1, distance=None)
+        assert record['status'] == 'error' and 'error' in record
+        assert len(_manifest(out)) == k+1
+    with pytest.raises(ValueError):
+        run_pipeline('unknown', [3], out)
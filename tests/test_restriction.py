@@ -0,0 +1,71 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Tests for the restriction decoder: that it corrects every error of
+    weight at most (d-1)/2, and that its logical error rate falls with the
+    distance.
+"""
+
+from qonstruct.code_builder.color_code import *
+from qonstruct.scheduling import *
+from qonstruct.qes.manager import QesManager
+from qonstruct.qes.noise import NoiseModel
+from qonstruct.restriction import *
+from qonstruct.ler import *
+
+import numpy as np
+import pytest
+
+import itertools
+
+def _circuit(d: int, noise: NoiseModel, rounds: int) -> 'stim.Circuit':
+    gr = make_hexagonal(d)
+    compute_syndrome_extraction_schedule(gr, backend='greedy')
+    color_tanner_graph(gr)
+    mgr = QesManager(gr)
+    mgr.noise = noise
+    return mgr.stim_circuit(rounds)
+
+@pytest.mark.parametrize('d', [5, 7])
+def test_corrects_low_weight_errors(d):
+    # Code capacity: every set of at most (d-1)/2 data qubit errors.
+    dem = _circuit(d, NoiseModel(p_timing=0.01), 1).detector_error_model(decompose_errors=False)
+    decoder = RestrictionDecoder(dem)
+    errors = []
+    for inst in dem.flattened():
+        if inst.type == 'error':
+            targets = inst.targets_copy()
+            dets = [t.val for t in targets if t.is_relative_detector_id()]
+            obs = sum(1 << t.val for t in targets if t.is_logical_observable_id())
+            errors.append((dets, obs))
+    for w in range(1, (d-1)//2 + 1):
+        for combo in itertools.combinations(errors, w):
+            fired = np.zeros(dem.num_detectors, dtype=bool)
+            obs = 0
+            for (dets, mask) in combo:
+                fired[dets] ^= True
+                obs ^= mask
+            assert decoder.decode(np.flatnonzero(fired)) == obs, combo
+
+def test_ler_falls_with_distance():
+    # Phenomenological noise, d rounds.
+    p = 0.01
+    failures = []
+    for d in [3, 5, 7]:
+        circuit = _circuit(d, NoiseModel(p_meas=p, p_timing=p), d)
+        result = estimate_logical_error_rate(circuit, 'restriction', max_shots=3000, batch_size=3000, processes=1, seed=1)
+        failures.append(result['failures'])
+    assert failures[0] > failures[1] > failures[2]
+
+def test_cached_syndromes_are_bounded(monkeypatch):
+    monkeypatch.setattr('qonstruct.restriction.MAX_CACHED_SYNDROMES', 4)
+    dem = _circuit(3, NoiseModel(p_timing=0.01), 1).detector_error_model(decompose_errors=False)
+    decoder = RestrictionDecoder(dem)
+    n = dem.num_detectors
+    fired = np.eye(n, dtype=np.uint8)
+    packed = np.packbits(fired, axis=1, bitorder='little')
+    expected = [decoder.decode(np.array([x])) for x in range(n)]
+    predictions = decoder.decode_batch(packed)
+    assert len(decoder._predictions) == 4
+    assert np.unpackbits(predictions, axis=1, bitorder='little')[:, 0].tolist() == expected
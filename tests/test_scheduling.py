@@ -0,0 +1,92 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Tests for the scheduler backends: schedules must be valid (in particular,
+    overlapping X and Z checks commute), and the greedy backend must be as
+    shallow as the CPLEX program on each check.
+"""
+
+from qonstruct.code_builder.base import *
+from qonstruct.code_builder.surface_code import make_rotated
+from qonstruct.code_builder.color_code import make_hexagonal
+from qonstruct.scheduling import *
+from qonstruct.scheduling import Model, _cplex_schedule_check, _greedy_schedule_check
+
+import pytest
+
+from functools import partial
+
+CODES = [make_rotated, make_hexagonal]
+
+def _depth(gr) -> int:
+    return max(len(gr.nodes[ch]['schedule_order']) for ch in gr.graph['checks']['all'])
+
+@pytest.mark.parametrize('make_code', CODES)
+@pytest.mark.parametrize('d', [3, 5, 7])
+@pytest.mark.parametrize('backend', ['greedy', 'auto'])
+@pytest.mark.parametrize('processes', [1, 2])
+def test_schedule_is_valid(make_code, d, backend, processes):
+    gr = make_code(d)
+    compute_syndrome_extraction_schedule(gr, processes=processes, backend=backend)
+    assert verify_syndrome_extraction_schedule(gr)
+
+@pytest.mark.skipif(Model is None, reason='requires docplex')
+@pytest.mark.parametrize('make_code', CODES)
+@pytest.mark.parametrize('d', [3, 5])
+def test_greedy_depth_matches_cplex(make_code, d):
+    # With one process, check i is solved against the checks before it that
+    # overlap with it. Both backends get the same problem for each check.
+    gr = make_code(d)
+    compute_syndrome_extraction_schedule(gr, backend='greedy')
+    checks = gr.graph['checks']['all']
+    max_check_weight = max(gr.degree(x) for x in checks)
+    overlaps = get_check_overlaps(gr, 'all')
+    for (i, ch) in enumerate(checks):
+        neighbors = [(gr.nodes[checks[j]]['node_type'], gr.nodes[checks[j]]['schedule_order'])
+                        for j in overlaps[i] if j < i]
+        problem = (get_support(gr, ch), gr.nodes[ch]['node_type'], neighbors, max_check_weight)
+        assert len(gr.nodes[ch]['schedule_order']) <= len(_cplex_schedule_check(problem))
+
+def _two_check_code(x_schedule: list, z_schedule: list):
+    gr = tanner_init()
+    add_check(gr, 2, 'x', [0, 1])
+    add_check(gr, 3, 'z', [0, 1])
+    gr.nodes[2]['schedule_order'] = x_schedule
+    gr.nodes[3]['schedule_order'] = z_schedule
+    return gr
+
+def test_verify_rejects_anticommuting_checks():
+    # The Z check goes after the X check on qubit 0 only.
+    assert not verify_syndrome_extraction_schedule(_two_check_code([0, 1], [1, 0]))
+    # After it on both qubits.
+    assert verify_syndrome_extraction_schedule(_two_check_code([0, 1], [None, None, 0, 1]))
+
+def test_verify_rejects_collisions_and_missing_qubits():
+    assert not verify_syndrome_extraction_schedule(_two_check_code([0, 1], [0, None, 1]))
+    gr = make_hexagonal(3)
+    compute_syndrome_extraction_schedule(gr, backend='greedy')
+    ch = gr.graph['checks']['all'][0]
+    gr.nodes[ch]['schedule_order'] = [q for q in gr.nodes[ch]['schedule_order'] if q is not None][1:]
+    assert not verify_syndrome_extraction_schedule(gr)
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_greedy_budget_fallback(processes):
+    gr = make_hexagonal(5)
+    compute_syndrome_extraction_schedule(gr, processes=processes, backend=partial(_greedy_schedule_check, budget=1))
+    assert verify_syndrome_extraction_schedule(gr)
+    # The fallback places each check after its neighbors, so it is deeper.
+    ref = make_hexagonal(5)
+    compute_syndrome_extraction_schedule(ref, processes=processes, backend='greedy')
+    assert _depth(gr) > _depth(ref)
+
+@pytest.mark.parametrize('make_code', CODES)
+@pytest.mark.parametrize('d', [3, 5, 7])
+@pytest.mark.parametrize('processes', [2, 3])
+def test_parallel_schedule_matches_serial(make_code, d, processes):
+    serial, parallel = make_code(d), make_code(d)
+    compute_syndrome_extraction_schedule(serial, processes=1, backend='greedy')
+    compute_syndrome_extraction_schedule(parallel, processes=processes, backend='greedy')
+    assert verify_syndrome_extraction_schedule(parallel)
+    for ch in serial.graph['checks']['all']:
+        assert parallel.nodes[ch]['schedule_order'] == serial.nodes[ch]['schedule_order']
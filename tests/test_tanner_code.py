@@ -0,0 +1,69 @@
+"""
+    author: Suhas Vittal
+    date:   18 October 2026
+
+    Tests for the array-backed TannerCode: conversion to and from networkx
+    graphs, and its methods against the code_builder.base functions.
+"""
+
+from qonstruct.code_builder.base import *
+from qonstruct.code_builder import base
+from qonstruct.code_builder.tanner_code import *
+from qonstruct.code_builder.surface_code import make_rotated
+from qonstruct.code_builder.color_code import *
+from qonstruct.scheduling import *
+from qonstruct.qes.manager import QesManager
+
+import numpy as np
+import pytest
+
+def _flagged_hex(d: int) -> nx.Graph:
+    gr = make_hexagonal(d)
+    compute_syndrome_extraction_schedule(gr, backend='greedy')
+    color_tanner_graph(gr)
+    QesManager(gr).assign_flags()
+    return gr
+
+def _assert_same_graph(a: nx.Graph, b: nx.Graph) -> None:
+    # Same nodes, attributes, adjacency and their order; same graph
+    # attributes, except for the parity-check matrix cache.
+    assert list(a.nodes(data=True)) == list(b.nodes(data=True))
+    assert [(x, list(a[x])) for x in a] == [(x, list(b[x])) for x in b]
+    keys = set(a.graph) - {'pcm_cache'}
+    assert keys == set(b.graph) - {'pcm_cache'}
+    for k in keys:
+        assert a.graph[k] == b.graph[k], k
+
+@pytest.mark.parametrize('make', [make_rotated, make_hexagonal, _flagged_hex])
+def test_graph_round_trip(make):
+    gr = make(5)
+    code = TannerCode.from_graph(gr)
+    assert len(code) == gr.number_of_nodes()
+    _assert_same_graph(code.to_graph(), gr)
+    # Through the arrays, with and without copying them.
+    for copy in [True, False]:
+        _assert_same_graph(TannerCode.from_arrays(code.to_arrays(), code.node_attrs, code.graph_attrs, copy).to_graph(), gr)
+
+def _build(call) -> None:
+    # Builds a small code with call(name of a code_builder.base function, args).
+    for q in range(4):
+        call('add_data_qubit', q)
+    call('add_check', 10, 'x', [0, 1, 2], schedule_order=[0, None, 1, 2])
+    call('add_check', 11, 'z', [1, 2, 3, 4], color=2)
+    call('add_observable', [0, 1], 'x')
+    call('add_plaquette', 0, [0, 1, None, 2], 1)
+    call('set_plaquette', 10, 0)
+    call('add_flags_to', 1, 2, 11)
+
+def test_methods_match_base():
+    gr, code = tanner_init(), TannerCode()
+    _build(lambda name, *args, **kwargs: getattr(base, name)(gr, *args, **kwargs))
+    _build(lambda name, *args, **kwargs: getattr(code, name)(*args, **kwargs))
+    _assert_same_graph(code.to_graph(), gr)
+    assert code.get_support(11) == get_support(gr, 11)
+    assert code.get_schedule_order(10) == [0, None, 1, 2]
+    assert code.get_color(11) == 2 and code.get_plaquette(10) == 0
+    assert code.node_type(4) == 'data' and 4 in code and 12 not in code
+    for s in ['x', 'z']:
+        for (a, b) in zip(code.get_parity_check_csr(s), get_parity_check_csr(gr, s)):
+            assert np.array_equal(a, b)
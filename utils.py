@@ -4,38 +4,15 @@
 """
 
 from qonstruct.code_builder.base import *
+import qonstruct.gf2 as gf2
 
 import networkx as nx
 import numpy as np
 
 def binrref(m: np.ndarray) -> tuple[np.ndarray, list[int]]:
-    # Returns RREF and pivot columns.
-    u = m.copy()
-    pivots = []
-    r,p=0,0
-    while r < m.shape[0] and p < m.shape[1]:
-        if not u[r,p]:
-            i = r+1
-            while i < m.shape[0] and not u[i,p]:
-                i += 1
-            if i == m.shape[0]:
-                p += 1
-                continue
-            u[[r,i],:] = u[[i,r],:]
-        pivots.append(p)
-        for i in range(r+1, m.shape[0]):
-            if u[i,p]:
-                u[i] = np.logical_xor(u[i], u[r])
-        r += 1
-        p += 1
-    # u is REF(m). Now we must make it a RREF.
-    for _i in range(len(pivots)):
-        i = len(pivots)-_i-1
-        j = pivots[i]
-        for ii in range(i):
-            if u[ii,j]:
-                u[ii] = np.logical_xor(u[ii], u[i])
-    return u, pivots
+    # Returns RREF and pivot columns. Elimination is done on bit-packed rows,
+    # see qonstruct.gf2.
+    return gf2.rref(m)
 
 def row(m: np.ndarray) -> np.ndarray:
     _, pivots = binrref(m.T)
@@ -43,20 +20,12 @@ def row(m: np.ndarray) -> np.ndarray:
 
 def null(m: np.ndarray) -> np.ndarray:
     A, pivots = binrref(m)
-    out = np.zeros((m.shape[1]-len(pivots), m.shape[1]), dtype=bool)
-    k = 0
-    for j in range(m.shape[1]):
-        if j in pivots:
-            continue
-        out[k,j] = True
-        k += 1
-    for (i,jp) in enumerate(pivots):
-        k = 0
-        for j in range(m.shape[1]):
-            if j in pivots:
-                continue
-            out[k,jp] = A[i,j]
-            k += 1
+    free = np.ones(m.shape[1], dtype=bool)
+    free[pivots] = False
+    free = np.flatnonzero(free)
+    out = np.zeros((len(free), m.shape[1]), dtype=bool)
+    out[np.arange(len(free)), free] = True
+    out[:, pivots] = A[:len(pivots)][:, free].T.astype(bool)
     return out
 
 def make_support_graph(tanner_graph: nx.Graph, op_type: str) -> nx.Graph:
@@ -64,10 +33,15 @@ def make_support_graph(tanner_graph: nx.Graph, op_type: str) -> nx.Graph:
     for x in tanner_graph.nodes():
         if tanner_graph.nodes[x]['node_type'] == op_type:
             gr.add_node(x)
-    for x in gr.nodes():
-        for y in gr.nodes():
-            if x == y:
-                continue
-            if len(list(nx.common_neighbors(tanner_graph, x, y))) > 0:
-                gr.add_edge(x, y)
+    # Visit every shared node once and join the nodes incident to it.
+    rank = {x: i for (i, x) in enumerate(gr.nodes())}
+    nodes = list(gr.nodes())
+    overlaps = [set() for _ in nodes]
+    for q in tanner_graph.nodes():
+        incident = [rank[x] for x in tanner_graph.neighbors(q) if x in rank]
+        for i in incident:
+            overlaps[i].update(incident)
+    for (i, x) in enumerate(nodes):
+        overlaps[i].discard(i)
+        gr.add_edges_from((x, nodes[j]) for j in sorted(overlaps[i]))
     return gr